@@ -1,16 +1,36 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from estimators import BoxCounting, RadiusOfGyration
+
 class AnalysisScreen:
+    """
+    Plots log(number of particles within radius R) versus log(R).
+
+    The number of particles with radius in range [i, i+1) is kept in a NumPy histogram
+    that doubles in size when the cluster outgrows it. Its prefix sums (and their logs)
+    are kept as well and only recalculated from the smallest radius registered since
+    the last update, which is usually near the edge of the cluster.
+
+    The same goes for the prefix sums of 1, x, y, xy, x^2 and y^2 over the log-log
+    points, so the least squares fit (or the error of any line) over a window of
+    points is found in closed form from two rows of sums, however long the curve is.
+
+    The box-counting dimension and the radius of gyration versus N are followed
+    particle by particle as well (see estimators.py), to cross-check the slope.
+    """
 
-    MAX_RADIUS = 1000
+    INITIAL_SIZE = 1024 # initial number of radii in the histogram
 
-    # array for saving the number of particles with radius in range [i, i+1)
-    countsPerRadius = [0] * MAX_RADIUS
+    # rows of fitSums: prefix sums of each term over the points with radius 1 to R
+    FIT_TERMS = 6 # 1, x, y, xy, x^2, y^2
+
+    maxRadius = 0 # largest radius registered
+    validRadius = 0 # the prefix sums are up to date below this radius
 
     maxX = 0;
-    arrX = [0]
-    cumulativeCounts = [0]
+    arrX = np.zeros(0) # log(R) of the plotted points
+    arrY = np.zeros(0) # log(number of particles within radius R) of the plotted points
 
     leftPercentage, rightPercentage = -1000, -1000
     leftLimit, rightLimit = -10, 1000
@@ -20,11 +40,22 @@ class AnalysisScreen:
         self.program = program
         self.plt = plt
 
+        # the number of particles with radius in range [i, i+1), its prefix sums and their logs
+        self.countsPerRadius = np.zeros(self.INITIAL_SIZE, dtype=np.int64)
+        self.cumulativeCounts = np.zeros(self.INITIAL_SIZE, dtype=np.int64)
+        self.logCounts = np.zeros(self.INITIAL_SIZE)
+        self.logRadii = np.log(np.maximum(np.arange(self.INITIAL_SIZE), 1))
+        self.fitSums = np.zeros((self.FIT_TERMS, self.INITIAL_SIZE))
+
+        # other estimators of the dimension, updated with every particle
+        self.boxCounting = BoxCounting()
+        self.radiusOfGyration = RadiusOfGyration()
+
         # initialise plot axes (initially hidden)
         self.axes = self.plt.axes([0, 0, 0, 0])
 
         # initialise plot axes and save it to update the values later
-        self.plotHandle, = self.axes.plot(self.arrX, self.cumulativeCounts, color='red', marker='.', markersize=3, linestyle='', label="particle count")
+        self.plotHandle, = self.axes.plot(self.arrX, self.arrY, color='red', marker='.', markersize=3, linestyle='', label="particle count")
 
         # initialise lines for windowing limits
         self.leftWindowHandle, = self.axes.plot([-10, -10], [-5, 20], color='black', linewidth=0.5, linestyle='--', label="windowing limits")
@@ -34,9 +65,134 @@ class AnalysisScreen:
         self.axes.set_xlim(([0, 0.5]))
         self.axes.set_ylim(([0, 0.5]))
 
+    def _reserve(self, size):
+        """ Grows the histogram and its prefix sums (doubling) to hold at least size radii """
+
+        if size <= len(self.countsPerRadius):
+            return
+
+        newSize = max(size, 2 * len(self.countsPerRadius))
+
+        for name in ("countsPerRadius", "cumulativeCounts", "logCounts"):
+            array = getattr(self, name)
+            newArray = np.zeros(newSize, dtype=array.dtype)
+            newArray[:len(array)] = array
+            setattr(self, name, newArray)
+
+        self.logRadii = np.log(np.maximum(np.arange(newSize), 1))
+
+        newFitSums = np.zeros((self.FIT_TERMS, newSize))
+        newFitSums[:, :self.fitSums.shape[1]] = self.fitSums
+        self.fitSums = newFitSums
+
     def registerRadius(self, radius):
         """ Increases the counter at index = int(radius) by one """
-        self.countsPerRadius[int(radius)] += 1
+
+        radius = int(radius)
+
+        # extend the counters for clusters larger than the current size
+        self._reserve(radius + 1)
+
+        self.countsPerRadius[radius] += 1
+        self.maxRadius = max(self.maxRadius, radius)
+        self.validRadius = min(self.validRadius, radius)
+
+    def registerRadii(self, radii):
+        """ Increases the counters at index = int(radius) by one for an array of radii """
+
+        radii = np.asarray(radii, dtype=np.int64)
+
+        if len(radii) == 0:
+            return
+
+        self._reserve(int(radii.max()) + 1)
+
+        self.countsPerRadius += np.bincount(radii, minlength=len(self.countsPerRadius))
+        self.maxRadius = max(self.maxRadius, int(radii.max()))
+        self.validRadius = min(self.validRadius, int(radii.min()))
+
+    def registerParticles(self, xs, ys):
+        """ Registers arrays of new particles in the histogram and the other estimators """
+
+        self.registerRadii(np.sqrt(xs*xs + ys*ys).astype(np.int64))
+        self.boxCounting.addSites(xs, ys)
+        self.radiusOfGyration.addSites(xs, ys)
+
+    def _updateCumulativeCounts(self):
+        """ Recalculates the prefix sums and their logs from the smallest radius registered since the last call """
+
+        start, end = self.validRadius, self.maxRadius + 1
+
+        if start >= end:
+            return
+
+        offset = self.cumulativeCounts[start-1] if start > 0 else 0
+        self.cumulativeCounts[start:end] = offset + np.cumsum(self.countsPerRadius[start:end])
+
+        # radii with no particles inside have no logarithm (plotted at -inf, i.e. not at all)
+        with np.errstate(divide='ignore'):
+            self.logCounts[start:end] = np.log(self.cumulativeCounts[start:end])
+
+        # terms of the points with a logarithm (radius > 0 and particles inside), zero otherwise
+        isPoint = (np.arange(start, end) > 0) & (self.cumulativeCounts[start:end] > 0)
+        x = np.where(isPoint, self.logRadii[start:end], 0)
+        y = np.where(isPoint, self.logCounts[start:end], 0)
+
+        terms = np.array([isPoint, x, y, x*y, x*x, y*y], dtype=np.float64)
+        offset = self.fitSums[:, start-1:start] if start > 0 else 0
+        self.fitSums[:, start:end] = offset + np.cumsum(terms, axis=1)
+
+        self.validRadius = end
+
+    def _getWindowSums(self, leftLimit, rightLimit):
+        """ Returns the sums of 1, x, y, xy, x^2 and y^2 over the points with leftLimit <= x <= rightLimit """
+
+        self._updateCumulativeCounts()
+
+        # log(R) increases with R, so the window is a range of radii
+        first = max(int(np.searchsorted(self.logRadii[:self.maxRadius+1], leftLimit, side='left')), 1)
+        last = int(np.searchsorted(self.logRadii[:self.maxRadius+1], rightLimit, side='right')) - 1
+
+        if last < first:
+            return np.zeros(self.FIT_TERMS)
+
+        return self.fitSums[:, last] - self.fitSums[:, first-1]
+
+    def getFit(self, leftLimit, rightLimit):
+        """ Returns the slope, intercept and standard error of the slope of the least squares
+        line through the points in the window, or None if there are fewer than 3 points
+        """
+
+        n, sx, sy, sxy, sxx, syy = self._getWindowSums(leftLimit, rightLimit)
+
+        # the error needs at least 3 points
+        if n < 3:
+            return None
+
+        # sums of squares about the means
+        ess = sxx - sx*sx/n
+        sxyCentred = sxy - sx*sy/n
+        syyCentred = syy - sy*sy/n
+
+        slope = sxyCentred / ess
+        intercept = (sy - slope*sx) / n
+        ssr = max(syyCentred - slope*sxyCentred, 0) / (n - 2)
+
+        return slope, intercept, np.sqrt(ssr / ess)
+
+    def getLineError(self, slope, intercept, leftLimit, rightLimit):
+        """ Returns the standard error of the slope of a given line over the points in the window (0 if fewer than 3 points) """
+
+        n, sx, sy, sxy, sxx, syy = self._getWindowSums(leftLimit, rightLimit)
+
+        if n < 3:
+            return 0
+
+        # Sum Square Residual of y - (slope*x + intercept), expanded into the sums
+        ssr = syy + slope*slope*sxx + n*intercept*intercept - 2*slope*sxy - 2*intercept*sy + 2*slope*intercept*sx
+        ssr = max(ssr, 0) / (n - 2)
+
+        return np.sqrt(ssr / (sxx - sx*sx/n))
 
     def hideScreen(self):
         """ hides the screen by setting the axes size 0 x 0 """
@@ -52,36 +208,21 @@ class AnalysisScreen:
         self.axes.set_position([0.29, 0.1, 0.44, 0.8])
 
     def updatePlot(self):
-        # find the last non-zero index from dataset (is also the x range)
-        lastNonZeroIndex = len(self.countsPerRadius) - 1
-
-        while self.countsPerRadius[lastNonZeroIndex] == 0 and lastNonZeroIndex > 0:
-            lastNonZeroIndex -= 1
+        self._updateCumulativeCounts()
 
-        nonZeroSize = lastNonZeroIndex + 1
+        self.program.controlPanel.infoAnalysis.updateDimensions(self.boxCounting.getDimension(), self.radiusOfGyration.getDimension())
 
         # exit if there is no data to plot
-        if lastNonZeroIndex < 1:
+        if self.maxRadius < 1:
             return
 
-        # generate an array for the x values (radius)
-        self.arrX = [i for i in range(nonZeroSize)]
-
-        # calculate cumulative radius count (y values)
-        count = 0
-        self.cumulativeCounts = [0] * (nonZeroSize)
-
-        for i in range(nonZeroSize):
-            count += self.countsPerRadius[i]
-            self.cumulativeCounts[i] = count
-
-        # decide plotting scale and frequency
-        self.arrX = np.log(self.arrX[1::])
-        self.cumulativeCounts = np.log(self.cumulativeCounts[1::])
+        # log of the radius (x values) and of the cumulative radius count (y values), radius 0 excluded
+        self.arrX = self.logRadii[1:self.maxRadius+1]
+        self.arrY = self.logCounts[1:self.maxRadius+1]
 
         # plot the number of particles with radius <= r versus r
         self.plotHandle.set_xdata(self.arrX)
-        self.plotHandle.set_ydata(self.cumulativeCounts)
+        self.plotHandle.set_ydata(self.arrY)
 
         # update windowing limits
         self.setLeftWindow(self.leftPercentage)
@@ -90,13 +231,17 @@ class AnalysisScreen:
         # set axis limits
         self.maxX = self.arrX[-1]
         self.axes.set_xlim([0, self.maxX + 0.5])
-        self.axes.set_ylim([0, self.cumulativeCounts[-1] + 0.5])
+        self.axes.set_ylim([0, self.arrY[-1] + 0.5])
 
         # pass limits to draw the best fit line
         bestFitLine = self.program.controlPanel.bestFitAnalysis
 
         bestFitLine.setXLim(self.maxX)
-        bestFitLine.setYLim(self.cumulativeCounts[-1])
+        bestFitLine.setYLim(self.arrY[-1])
+
+        # the fit (which is relative to the middle of the x range) is only valid after the new limits
+        if bestFitLine.isAutoFit:
+            self.calculateError()
 
         bestFitLine.updateLineEquation()
 
@@ -119,29 +264,22 @@ class AnalysisScreen:
         self.plt.draw()
 
     def calculateError(self):
-        validPosX = []
-        ssr = 0
-        ess = 0
+        """ Updates the standard error of the slope of the ruler over the window, or fits the ruler in the auto fit mode """
 
         line = self.program.controlPanel.bestFitAnalysis
 
-        # find Sum Square Risidual (sum of delta y squared)
-        for i, x in enumerate(self.arrX):
-            if self.leftLimit <= x <= self.rightLimit:
-                ssr += (self.cumulativeCounts[i] - line.getY(x)) ** 2
-                validPosX.append(x)
-
-        # exit if athere are less tha 2 points available (gradient cannot be calculated)
-        if len(validPosX) < 3:
-            self.program.controlPanel.infoAnalysis.updateError(0)
-            return
-
-        ssr /= len(validPosX) - 2
+        if line.isAutoFit:
+            fit = self.getFit(self.leftLimit, self.rightLimit)
 
-        # find Explained Sum Squared
-        averageX = sum(validPosX) / len(validPosX)
+            # exit if there are less than 3 points available (the error cannot be calculated)
+            if fit is None:
+                self.program.controlPanel.infoAnalysis.updateError(0)
+                return
 
-        ess = sum([(x - averageX)**2 for x in validPosX])
+            slope, intercept, error = fit
+            line.setFit(slope, intercept)
+        else:
+            error = self.getLineError(line.slope, line.getY(0), self.leftLimit, self.rightLimit)
 
         # update the error in gradient
-        self.program.controlPanel.infoAnalysis.updateError(np.sqrt(ssr / ess))
+        self.program.controlPanel.infoAnalysis.updateError(error)
@@ -0,0 +1,254 @@
+import heapq
+
+import numpy as np
+
+class BatchEngine:
+    """
+    Grows the cluster of a Lattice with many walkers at once, kept in NumPy arrays.
+
+    In every iteration each walker in flight takes a path of STEPS_PER_ITERATION unit
+    steps, or one long jump where the walk mode allows it, and all paths are checked for
+    contacts together. Contacts are resolved in the order of their step in the path (then
+    of launch), and a particle that sticks cuts the paths of the walkers that would reach
+    it later in the same iteration: they stick next to it, or are launched again if they
+    would step on it. Every particle so only sees the particles that arrived before it.
+    Walkers follow the walk and boundary modes of the lattice (long jumps, wrapping or
+    re-entering on the launch circle).
+
+    Modes
+        "ARRIVAL": a new walker is launched whenever another one sticks, with at most
+                   IN_FLIGHT_PER_RADIUS walkers in flight per site of launch radius (and
+                   never more than batchSize). Walkers crowding the small cluster of the
+                   first particles would make it denser than with one-by-one DLA.
+        "MULTI":   multi-particle DLA, a different model. All requested particles are
+                   launched together, so at high density walkers compete for the same
+                   growth sites and the aggregate becomes denser than with one-by-one DLA.
+    """
+
+    IN_FLIGHT_PER_RADIUS = 0.5 # walkers in flight per site of launch radius in the "ARRIVAL" mode
+    STEPS_PER_ITERATION = 24 # unit steps of a walker per iteration
+
+    def __init__(self, lattice, batchSize=1024, mode="ARRIVAL"):
+        self.lattice = lattice
+        self.batchSize = batchSize
+        self.mode = mode
+
+        self.resetRandomGenerator()
+
+    def resetRandomGenerator(self):
+        """ Starts a new random stream for the walkers, spawned from the seed sequence of the lattice """
+        self.randomGenerator = np.random.default_rng(self.lattice.seedSequence.spawn(1)[0])
+
+    def _launch(self, count, radius):
+        """ Returns the rows and columns of walkers placed at random on the launch circle """
+
+        centre = self.lattice.INT_HALF_MAP_SIZE
+        angles = self.randomGenerator.uniform(0, 2*np.pi, count)
+
+        return (centre + radius*np.cos(angles)).astype(np.int64), (centre + radius*np.sin(angles)).astype(np.int64)
+
+    def _reenter(self, ys, xs, launchRadius):
+        """ Returns the rows and columns where walkers outside the launch circle first hit it (see Lattice._reenter) """
+
+        centre = self.lattice.INT_HALF_MAP_SIZE
+
+        ratios = launchRadius / np.sqrt(xs*xs + ys*ys)
+        angles = np.arctan2(ys, xs) + 2 * np.arctan((1 - ratios) / (1 + ratios) * np.tan(self.randomGenerator.uniform(0, 2*np.pi, len(xs)) / 2 - np.pi / 2))
+
+        return centre + np.round(launchRadius * np.sin(angles)).astype(np.int64), centre + np.round(launchRadius * np.cos(angles)).astype(np.int64)
+
+    def add(self, count):
+        """ Adds count particles and returns their x and y coordinates as lists, in arrival order """
+
+        lattice = self.lattice
+        grid = lattice.map
+        CENTRE = lattice.INT_HALF_MAP_SIZE
+        STEPS = self.STEPS_PER_ITERATION
+
+        # positions of the walkers in flight, the order they were launched and their moves so far
+        rows = np.zeros(0, dtype=np.int64)
+        cols = np.zeros(0, dtype=np.int64)
+        orders = np.zeros(0, dtype=np.int64)
+        moves = np.zeros(0, dtype=np.int64)
+        launchCount = 0
+
+        # offsets from a particle where a walker touches it (the stencil) or steps on it
+        isReachingOffset = np.zeros((3, 3), dtype=np.bool_)
+        isReachingOffset[lattice.DIRECTION_ROWS + 1, lattice.DIRECTION_COLS + 1] = True
+        isReachingOffset[1, 1] = True
+
+        # step of each position of a path, the start included
+        times = np.arange(STEPS + 1)
+
+        stats = lattice.stats
+
+        xs, ys = [], []
+
+        while len(xs) < count:
+            # the boundary grows with the cluster
+            r = lattice.maxRadius + lattice.EXTRA_RADIUS
+            radiusLimit = grid.getRadiusLimit(CENTRE)
+
+            # re-entry only without bias, as in Lattice.add
+            isRelaunching = lattice.boundaryMode == "RELAUNCH" and lattice._isIsotropic()
+            killRadius = min(lattice.KILL_RADIUS_FACTOR * r, radiusLimit - 1)
+
+            if (killRadius <= r) if isRelaunching else (r > radiusLimit):
+                print("[Error] <BatchEngine::add> Out of boundary")
+                break
+
+            # walkers in flight: growing with the cluster in the "ARRIVAL" mode, all at once in the "MULTI" mode
+            inFlightLimit = min(self.batchSize, max(1, int(self.IN_FLIGHT_PER_RADIUS * r))) if self.mode == "ARRIVAL" else count
+
+            # launch new walkers, never more than the particles still needed
+            newCount = min(inFlightLimit, count - len(xs)) - len(rows)
+
+            if newCount > 0:
+                newRows, newCols = self._launch(newCount, r)
+
+                rows = np.concatenate((rows, newRows))
+                cols = np.concatenate((cols, newCols))
+                orders = np.concatenate((orders, np.arange(launchCount, launchCount + newCount)))
+                moves = np.concatenate((moves, np.zeros(newCount, dtype=np.int64)))
+                launchCount += newCount
+
+            walkerCount = len(rows)
+
+            # draw the unit steps of the paths
+            stepRows, stepCols = lattice._drawSteps(walkerCount * STEPS, self.randomGenerator)
+            stepRows, stepCols = stepRows.reshape(walkerCount, STEPS), stepCols.reshape(walkerCount, STEPS)
+
+            # the last step of each path (a long jump is a path of one move)
+            ends = np.full(walkerCount, STEPS)
+            isJumping = np.zeros(walkerCount, dtype=np.bool_)
+
+            if isRelaunching or (lattice.distanceMap is not None and lattice._isIsotropic()):
+                # long jumps over circles free of particles, outside the circle of the cluster without the distance map (see Lattice.add)
+                if lattice.distanceMap is not None:
+                    jumpRadii = lattice.distanceMap.distances(cols - CENTRE, rows - CENTRE) - lattice.JUMP_MARGIN
+                else:
+                    jumpRadii = np.sqrt((cols - CENTRE)**2 + (rows - CENTRE)**2) - max(lattice.maxRadius + 1, lattice.seedRadius) - lattice.JUMP_MARGIN
+
+                if not isRelaunching:
+                    edgeDistances = np.minimum(np.minimum(rows - (CENTRE - r), (CENTRE + r) - rows), np.minimum(cols - (CENTRE - r), (CENTRE + r) - cols)) - 1
+                    jumpRadii = np.minimum(jumpRadii, edgeDistances)
+
+                isJumping = jumpRadii >= lattice.MIN_JUMP_RADIUS
+                angles = self.randomGenerator.uniform(0, 2*np.pi, int(isJumping.sum()))
+
+                stepRows[isJumping, 0] = np.round(jumpRadii[isJumping] * np.sin(angles))
+                stepCols[isJumping, 0] = np.round(jumpRadii[isJumping] * np.cos(angles))
+                ends[isJumping] = 1
+
+            # positions along the paths, from the start (a walker launched again may already touch the cluster)
+            pathRows = np.cumsum(np.concatenate((rows[:, None], stepRows), axis=1), axis=1)
+            pathCols = np.cumsum(np.concatenate((cols[:, None], stepCols), axis=1), axis=1)
+
+            if isRelaunching:
+                # a path ends where it leaves the kill circle
+                pathYs, pathXs = pathRows - CENTRE, pathCols - CENTRE
+                isOutside = pathXs*pathXs + pathYs*pathYs > killRadius * killRadius
+
+                ends = np.where(isOutside.any(axis=1), np.minimum(ends, isOutside.argmax(axis=1)), ends)
+                isInPath = (times <= ends[:, None]) & ~isOutside
+            else:
+                # wrap the paths into the box, stepping from a wrapped position wraps the sum of the steps
+                MIN_BOUNDARY, MAX_BOUNDARY = CENTRE - r, CENTRE + r
+
+                pathRows = (pathRows - MIN_BOUNDARY) % (2*r) + MIN_BOUNDARY
+                pathCols = (pathCols - MIN_BOUNDARY) % (2*r) + MIN_BOUNDARY
+
+                # a step is wrapped if it leaves the box from the wrapped position before it (see Lattice.add)
+                steppedRows, steppedCols = pathRows[:, :-1] + stepRows, pathCols[:, :-1] + stepCols
+                isWrapped = (steppedRows <= MIN_BOUNDARY) | (steppedRows >= MAX_BOUNDARY) | (steppedCols <= MIN_BOUNDARY) | (steppedCols >= MAX_BOUNDARY)
+                isInPath = times <= ends[:, None]
+
+            isTouching = np.zeros(isInPath.shape, dtype=np.bool_)
+            isTouching[isInPath] = grid.hasNeighbours(pathRows[isInPath], pathCols[isInPath])
+
+            # each walker stops at its first contact, or at the end of its path
+            hasContact = isTouching.any(axis=1)
+            stops = np.where(hasContact, isTouching.argmax(axis=1), ends)
+
+            # the box around each path, to find the paths passing by a new particle quickly
+            minRows, maxRows, minCols, maxCols = pathRows.min(axis=1), pathRows.max(axis=1), pathCols.min(axis=1), pathCols.max(axis=1)
+
+            isStuck = np.zeros(walkerCount, dtype=np.bool_)
+            isDisplaced = np.zeros(walkerCount, dtype=np.bool_)
+
+            # contacts in the order of their step, then of launch
+            contacts = np.flatnonzero(hasContact)
+            events = list(zip(stops[contacts].tolist(), orders[contacts].tolist(), contacts.tolist()))
+            heapq.heapify(events)
+
+            while events and len(xs) < count:
+                time, _, i = heapq.heappop(events)
+
+                # the walker has stuck or collided already, or its path was cut earlier
+                if isStuck[i] or isDisplaced[i] or stops[i] != time:
+                    continue
+
+                row, col = int(pathRows[i, time]), int(pathCols[i, time])
+
+                if grid.get(row, col):
+                    # another walker has stuck on the same site
+                    isDisplaced[i] = True
+                    continue
+
+                x, y = lattice._register(row, col)
+                xs.append(x)
+                ys.append(y)
+
+                isStuck[i] = True
+
+                # cut the paths reaching the new particle from this step on, among those passing by: they touch it or step on it
+                walkers = np.flatnonzero((minRows <= row + 1) & (maxRows >= row - 1) & (minCols <= col + 1) & (maxCols >= col - 1) & ~isStuck & ~isDisplaced)
+
+                if len(walkers) == 0:
+                    continue
+
+                rowOffsets, colOffsets = pathRows[walkers] - row, pathCols[walkers] - col
+                isNear = (np.abs(rowOffsets) <= 1) & (np.abs(colOffsets) <= 1) & (times >= time) & (times <= stops[walkers, None])
+
+                nearIndices, nearTimes = np.nonzero(isNear)
+                isReaching = isReachingOffset[rowOffsets[nearIndices, nearTimes] + 1, colOffsets[nearIndices, nearTimes] + 1]
+
+                # the first step of each walker reaching it (np.nonzero lists the steps of a walker in order)
+                nearIndices, nearTimes = nearIndices[isReaching], nearTimes[isReaching]
+                isFirst = np.diff(nearIndices, prepend=-1) != 0
+                nearWalkers, nearTimes = walkers[nearIndices[isFirst]], nearTimes[isFirst]
+
+                stops[nearWalkers] = nearTimes
+
+                for event in zip(nearTimes.tolist(), orders[nearWalkers].tolist(), nearWalkers.tolist()):
+                    heapq.heappush(events, event)
+
+            moves += stops
+            stats.recordParticles(moves[isStuck])
+            stats.jumpCount += int(np.count_nonzero(isJumping & (stops > 0)))
+
+            if not isRelaunching:
+                stats.wrapCount += int(np.count_nonzero(isWrapped & (times[1:] <= stops[:, None])))
+
+            if len(xs) == count:
+                break
+
+            # the walkers still in flight carry on from where they stopped
+            walkers = np.arange(walkerCount)
+            rows, cols = pathRows[walkers, stops], pathCols[walkers, stops]
+
+            if isRelaunching:
+                # re-enter on the launch circle if outside the kill circle
+                isKilled = isOutside[walkers, stops] & ~isStuck & ~isDisplaced
+
+                if isKilled.any():
+                    rows[isKilled], cols[isKilled] = self._reenter(rows[isKilled] - CENTRE, cols[isKilled] - CENTRE, r)
+                    stats.reentryCount += int(np.count_nonzero(isKilled))
+
+            # walkers that collided are launched again (their moves carry on)
+            if isDisplaced.any():
+                rows[isDisplaced], cols[isDisplaced] = self._launch(int(isDisplaced.sum()), r)
+
+            rows, cols, orders, moves = rows[~isStuck], cols[~isStuck], orders[~isStuck], moves[~isStuck]
+
+        return xs, ys
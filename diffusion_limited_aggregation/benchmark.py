@@ -0,0 +1,254 @@
+'''
+Measures the growth throughput of the lattice engines, to check whether a change helps.
+
+Clusters are grown to fixed sizes with a fixed seed under every engine configuration
+(lattice backend, walk strategy, engine with its batch size and bias on/off), each in a
+fresh process so that the peak memory of one run does not carry over to the next. Only
+the growth is timed (not the construction of the lattice), and every configuration is
+run several times, in rounds over all configurations, as single runs vary by tens of
+percent on a busy machine. The particles per second of the fastest run, the mean moves
+per particle and the peak memory are written to a JSON file, which can be compared
+against a stored baseline (scaled by the speed of the machine in both sessions, measured
+with a fixed workload that does not depend on the lattice code):
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --output results.json --baseline baseline.json
+
+Runs whose fastest time is slower than the baseline by more than the tolerance are
+reported, and the exit status is 1 if there are any. The default suite takes minutes.
+The runs in unit steps (the "UNIT" walk, and every biased run, as the bias rules out long
+jumps) take minutes each for 10000 particles and hours for 100000, so they are only grown
+up to MAX_UNIT_SIZE particles unless asked for, with the configurations selected:
+
+    python benchmark.py --sizes 100000 --walk UNIT --bias OFF --engine BATCH --max-unit-size 100000
+'''
+
+import numpy as np
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None # not available on Windows, the peak memory is not measured
+
+import headless
+
+SIZES = [1000, 10000]
+MAX_UNIT_SIZE = 1000 # largest size of the runs in unit steps by default
+SEED = 1
+
+MAP_SIZE = 4096 # "DENSE" and "BITPACKED" maps large enough for 100000 particles
+BIAS = [2, 1, 1, 1] # bias of the biased configurations
+BATCH_SIZE = 1024 # most walkers in flight of the "BATCH" engine (see BatchEngine)
+
+# walk strategies: walk mode and boundary mode (a biased walk is wrapped, see Lattice.setBoundaryMode)
+WALKS = {
+    "UNIT": ("UNIT", "WRAP"),
+    "JUMP": ("JUMP", "RELAUNCH"),
+}
+
+REPEATS = 5 # runs of every configuration, the fastest one is compared
+CALIBRATION_LOOPS = 2000000 # iterations of the workload measuring the speed of the machine
+TOLERANCE = 0.1 # slowdown of the fastest run relative to the baseline reported as a regression
+
+
+def getPeakMemory():
+    """ Returns the peak resident memory of this process in MB (None if unknown) """
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+def getConfigurations(backends=("DENSE", "BITPACKED", "TILED"), walks=tuple(WALKS), engines=("SEQUENTIAL", "BATCH"), biases=(False, True),
+                      batchSize=BATCH_SIZE):
+    """ Returns every combination of the given settings as a list of dictionaries """
+
+    return [{
+        "name": "{0}-{1}-{2}-{3}".format(backend, walk, engine if engine == "SEQUENTIAL" else "{0}{1:d}".format(engine, batchSize),
+                                         "BIASED" if isBiased else "UNBIASED"),
+        "backend": backend,
+        "walk": walk,
+        "engine": engine,
+        "batchSize": batchSize,
+        "isBiased": isBiased,
+    } for backend, walk, engine, isBiased in itertools.product(backends, walks, engines, biases)]
+
+def runBenchmark(job):
+    """ Grows one cluster and returns its measurements (runs in a fresh worker process) """
+
+    configuration, count = job["configuration"], job["count"]
+    walkMode, boundaryMode = WALKS[configuration["walk"]]
+
+    if configuration["isBiased"]:
+        boundaryMode = "WRAP"
+
+    # only the growth is timed
+    lattice = headless.createLattice(job["seed"], BIAS if configuration["isBiased"] else None, backend=configuration["backend"],
+                                     walkMode=walkMode, boundaryMode=boundaryMode, engine=configuration["engine"],
+                                     batchSize=configuration["batchSize"], mapSize=MAP_SIZE)
+
+    memory = getPeakMemory()
+    executionTime = time.perf_counter()
+
+    lattice.addMany(count)
+
+    executionTime = time.perf_counter() - executionTime
+    peakMemory = getPeakMemory()
+    stats = lattice.getStats()
+
+    return {
+        "name": configuration["name"],
+        "count": count,
+        "seed": job["seed"],
+        "configuration": configuration,
+        "particleCount": lattice.particleCount,
+        "seconds": executionTime,
+        "particlesPerSecond": lattice.particleCount / executionTime,
+        "movesPerParticle": stats["movesPerParticle"],
+        "walkShare": stats["walkShare"],
+        "peakMemoryMB": peakMemory,
+        "growthMemoryMB": None if peakMemory is None else peakMemory - memory,
+    }
+
+def runCalibration():
+    """ Returns the time of a fixed pure Python workload, as a measure of the speed of the machine (runs in a fresh worker process) """
+
+    executionTime = time.perf_counter()
+    total = 0
+
+    for i in range(CALIBRATION_LOOPS):
+        total += i * i % 7
+
+    return time.perf_counter() - executionTime
+
+def summariseRepeats(runs):
+    """ Returns the result of one configuration from its repeated runs: the fastest time, and all the times """
+
+    # the fastest run is the least disturbed by other load on the machine
+    seconds = sorted(run["seconds"] for run in runs)
+    result = dict(runs[0])
+
+    result["seconds"] = seconds[0]
+    result["particlesPerSecond"] = result["particleCount"] / result["seconds"]
+    result["repeatSeconds"] = seconds
+
+    # the memory of the largest run (the same up to noise, as every run grows the same cluster)
+    if result["peakMemoryMB"] is not None:
+        result["peakMemoryMB"] = max(run["peakMemoryMB"] for run in runs)
+        result["growthMemoryMB"] = max(run["growthMemoryMB"] for run in runs)
+
+    return result
+
+def isUnitStep(configuration):
+    """ Returns True iff a configuration walks in unit steps only (the "UNIT" walk, or any biased walk) """
+    return configuration["walk"] == "UNIT" or configuration["isBiased"]
+
+def runSuite(configurations, sizes=SIZES, seed=SEED, repeats=REPEATS, maxUnitSize=MAX_UNIT_SIZE):
+    """ Runs every configuration for every size repeats times, one process per run, and returns the results file contents
+    (the configurations in unit steps only up to maxUnitSize particles, None for every size) """
+
+    jobs = [{"configuration": configuration, "count": count, "seed": seed} for count in sizes for configuration in configurations
+            if maxUnitSize is None or count <= maxUnitSize or not isUnitStep(configuration)]
+    rounds, calibrations, results = [], [], []
+
+    # one run at a time, so that the runs do not compete for the cores and memory bandwidth,
+    # in rounds over all jobs, so that a busy period of the machine does not slow down every run of one job
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for _ in range(repeats):
+            calibrations.append(pool.apply(runCalibration))
+            rounds.append(pool.map(runBenchmark, jobs, chunksize=1))
+
+        for i in range(len(jobs)):
+            result = summariseRepeats([runs[i] for runs in rounds])
+
+            print("{0:>40} {1:>7d}: {2:9.1f} particles/s (runs {3}), {4:9.1f} moves/particle, {5} MB".format(
+                result["name"], result["count"], result["particlesPerSecond"], " ".join("{0:.2f}".format(seconds) for seconds in result["repeatSeconds"]),
+                result["movesPerParticle"], "-" if result["peakMemoryMB"] is None else "{0:.0f}".format(result["peakMemoryMB"])))
+
+            results.append(result)
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "repeats": repeats,
+        "calibrationSeconds": min(calibrations),
+        "results": results,
+    }
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """ Returns (name, count, speed-up) of the runs in both files, and the ones slower than the baseline by more than tolerance """
+
+    baselineRuns = {(result["name"], result["count"], result["seed"]): result for result in baseline["results"]}
+    comparisons, regressions = [], []
+
+    # a slower machine (or a busier session) takes longer for the calibration workload too
+    machineSpeedUp = 1
+
+    if "calibrationSeconds" in results and "calibrationSeconds" in baseline:
+        machineSpeedUp = baseline["calibrationSeconds"] / results["calibrationSeconds"]
+
+    for result in results["results"]:
+        previous = baselineRuns.get((result["name"], result["count"], result["seed"]))
+
+        if previous is None:
+            continue
+
+        speedUp = result["particlesPerSecond"] / previous["particlesPerSecond"] / machineSpeedUp
+        comparisons.append((result["name"], result["count"], speedUp))
+
+        if speedUp < 1 - tolerance:
+            regressions.append((result["name"], result["count"], speedUp))
+
+    return comparisons, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the growth throughput of the lattice engines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="cluster sizes to grow")
+    parser.add_argument("--seed", type=int, default=SEED, help="random seed of every run")
+    parser.add_argument("--backend", nargs="+", default=["DENSE", "BITPACKED", "TILED"], choices=["DENSE", "BITPACKED", "TILED"])
+    parser.add_argument("--walk", nargs="+", default=list(WALKS), choices=list(WALKS), help="UNIT: unit steps in a wrapping box, JUMP: long jumps and re-entry")
+    parser.add_argument("--engine", nargs="+", default=["SEQUENTIAL", "BATCH"], choices=["SEQUENTIAL", "BATCH"])
+    parser.add_argument("--bias", nargs="+", default=["OFF", "ON"], choices=["OFF", "ON"], help="runs without and/or with bias")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="most walkers in flight of the BATCH engine")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="runs of every configuration (the fastest one is compared)")
+    parser.add_argument("--output", default="benchmark.json", help="results file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="slowdown reported as a regression (0.1 for 10%%)")
+    parser.add_argument("--max-unit-size", type=int, default=MAX_UNIT_SIZE, help="largest size of the runs in unit steps (UNIT walk or bias), slow for large sizes")
+    args = parser.parse_args()
+
+    configurations = getConfigurations(args.backend, args.walk, args.engine, [bias == "ON" for bias in args.bias], args.batch_size)
+    results = runSuite(configurations, args.sizes, args.seed, args.repeats, args.max_unit_size)
+
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=4)
+
+    if args.baseline is None:
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    comparisons, regressions = compare(results, baseline, args.tolerance)
+
+    for name, count, speedUp in comparisons:
+        print("{0:>40} {1:>7d}: {2:.2f}x".format(name, count, speedUp))
+
+    if len(regressions) > 0:
+        print("{0:d} runs are slower than the baseline by more than {1:.0f}%".format(len(regressions), 100 * args.tolerance))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
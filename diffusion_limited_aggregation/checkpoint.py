@@ -0,0 +1,120 @@
+import numpy as np
+import json
+import os
+
+# file names inside a checkpoint directory
+GRID_FILE = "lattice.dat"
+STICKY_FILE = "sticky.dat" # scratch file of the sticky mask, rebuilt from the grid when resuming
+LOG_FILE = "arrivals.dat"
+META_FILE = "checkpoint.json"
+
+# kinds of entries in the arrival log
+SEED, PARTICLE = 0, 1
+
+class ArrivalLog:
+    """
+    Memory-mapped list of occupied positions (row, col, kind) in the order they were set.
+
+    The file starts with the number of entries as an int64, followed by the entries as
+    int32 triples. The file is doubled in size whenever it is full.
+    """
+
+    INITIAL_CAPACITY = 65536
+    HEADER_BYTES = 8
+    ENTRY_BYTES = 3 * 4
+
+    def __init__(self, path, isNew=True):
+        self.path = path
+
+        if isNew:
+            with open(path, 'wb') as file:
+                file.truncate(self.HEADER_BYTES + self.INITIAL_CAPACITY * self.ENTRY_BYTES)
+
+        self._map()
+
+    def _map(self):
+        """ Maps the header and the entries of the file into memory """
+
+        capacity = (os.path.getsize(self.path) - self.HEADER_BYTES) // self.ENTRY_BYTES
+
+        self.header = np.memmap(self.path, dtype=np.int64, mode='r+', shape=(1,))
+        self.entries = np.memmap(self.path, dtype=np.int32, mode='r+', offset=self.HEADER_BYTES, shape=(capacity, 3))
+
+    def __len__(self):
+        return int(self.header[0])
+
+    def _reserve(self, capacity):
+        """ Grows the file (doubling its size) until it holds at least capacity entries """
+
+        if capacity <= len(self.entries):
+            return
+
+        self.flush()
+        newCapacity = len(self.entries)
+
+        while newCapacity < capacity:
+            newCapacity *= 2
+
+        # release the old maps before resizing the file
+        del self.header, self.entries
+
+        with open(self.path, 'r+b') as file:
+            file.truncate(self.HEADER_BYTES + newCapacity * self.ENTRY_BYTES)
+
+        self._map()
+
+    def append(self, row, col, kind):
+        """ Adds an entry at the end, growing the file if it is full """
+
+        count = len(self)
+        self._reserve(count + 1)
+
+        # the entry is written before the count, so the count never covers a missing entry
+        self.entries[count] = (row, col, kind)
+        self.header[0] = count + 1
+
+    def extend(self, rows, cols, kinds):
+        """ Adds arrays of entries at the end (kinds is one kind for all or an array) """
+
+        count, newCount = len(self), len(self) + len(rows)
+        self._reserve(newCount)
+
+        self.entries[count:newCount, 0] = rows
+        self.entries[count:newCount, 1] = cols
+        self.entries[count:newCount, 2] = kinds
+        self.header[0] = newCount
+
+    def getEntries(self, start=0, end=None):
+        """ Returns the rows, columns and kinds of the entries in [start, end) """
+
+        entries = self.entries[start:len(self) if end is None else end]
+        return entries[:, 0], entries[:, 1], entries[:, 2]
+
+    def truncate(self, count):
+        """ Forgets all entries after the first count entries """
+        self.header[0] = count
+
+    def flush(self):
+        """ Writes any changes in memory to the file """
+        self.entries.flush()
+        self.header.flush()
+
+
+def writeCheckpoint(directory, meta):
+    """ Writes the checkpoint metadata atomically (a crash leaves either the old or the new file) """
+
+    path = os.path.join(directory, META_FILE)
+    temporaryPath = path + ".tmp"
+
+    with open(temporaryPath, 'w') as file:
+        json.dump(meta, file)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporaryPath, path)
+
+def readCheckpoint(directory):
+    """ Returns the checkpoint metadata saved in a directory """
+
+    with open(os.path.join(directory, META_FILE)) as file:
+        return json.load(file)
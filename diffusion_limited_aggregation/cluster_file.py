@@ -0,0 +1,119 @@
+'''
+Compact file format for a grown cluster, see Lattice.exportCluster.
+
+    magic (8 bytes), version (uint32), metadata length (uint32), metadata (JSON)
+    chunk: count (uint32), item size (uint8), compressed length (uint32), data
+    chunk: ...
+
+The metadata holds the settings of the run (random seed and state, bias, stencil,
+walk, boundary and engine modes) and the seeds. The chunks hold the occupied positions
+in arrival order, CHUNK_SIZE at a time: x, y as int16 (or int32 for large clusters)
+and the kinds as int8 (checkpoint.SEED or PARTICLE), each split into byte planes
+(all low bytes, then all high bytes) and compressed with zlib. The high bytes of the
+coordinates hardly change, so the file is much smaller than the raw coordinates.
+
+The chunks can be read one at a time with iterClusterChunks, so that the positions
+are plotted and analysed as they arrive instead of after the whole file is read.
+'''
+
+import numpy as np
+import json
+import struct
+import zlib
+
+MAGIC = b"DLACLSTR"
+VERSION = 1
+EXTENSION = ".dla"
+
+CHUNK_SIZE = 65536 # positions per chunk
+COMPRESSION_LEVEL = 6
+
+HEADER_FORMAT = "<8sII" # magic, version, metadata length
+CHUNK_FORMAT = "<IBI" # count, item size of the coordinates, compressed length
+
+
+def _toBytePlanes(array):
+    """ Returns the bytes of an array reordered into byte planes (little-endian) """
+    return np.ascontiguousarray(array.astype(array.dtype.newbyteorder('<')).view(np.uint8).reshape(-1, array.itemsize).T).tobytes()
+
+def _fromBytePlanes(data, dtype, count):
+    """ Returns the array of count values of dtype stored as byte planes (see _toBytePlanes) """
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(np.dtype(dtype).itemsize, count)
+    return np.ascontiguousarray(planes.T).view(np.dtype(dtype).newbyteorder('<')).ravel()
+
+def writeClusterFile(path, xs, ys, kinds, meta):
+    """ Writes the positions (in arrival order) and the metadata of a cluster into a file """
+
+    xs, ys, kinds = np.asarray(xs), np.asarray(ys), np.asarray(kinds, dtype=np.int8)
+
+    # the smallest integer type holding every coordinate
+    limit = max(int(np.abs(xs).max(initial=0)), int(np.abs(ys).max(initial=0)))
+    dtype = np.int16 if limit <= np.iinfo(np.int16).max else np.int32
+
+    metaBytes = json.dumps(meta).encode("utf-8")
+
+    with open(path, 'wb') as file:
+        file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(metaBytes)))
+        file.write(metaBytes)
+
+        for start in range(0, len(xs), CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, len(xs))
+
+            data = _toBytePlanes(xs[start:end].astype(dtype)) + _toBytePlanes(ys[start:end].astype(dtype)) + kinds[start:end].tobytes()
+            data = zlib.compress(data, COMPRESSION_LEVEL)
+
+            file.write(struct.pack(CHUNK_FORMAT, end - start, np.dtype(dtype).itemsize, len(data)))
+            file.write(data)
+
+def _readHeader(file):
+    """ Reads the header of an open cluster file and returns the metadata """
+
+    magic, version, metaLength = struct.unpack(HEADER_FORMAT, file.read(struct.calcsize(HEADER_FORMAT)))
+
+    if magic != MAGIC or version > VERSION:
+        raise ValueError("Not a cluster file (or a newer version): {}".format(file.name))
+
+    return json.loads(file.read(metaLength).decode("utf-8"))
+
+def readClusterMeta(path):
+    """ Returns the metadata of a cluster file without reading the positions """
+
+    with open(path, 'rb') as file:
+        return _readHeader(file)
+
+def iterClusterChunks(path):
+    """ Yields the x, y coordinates (int64) and kinds of the positions of a cluster file, one chunk at a time """
+
+    with open(path, 'rb') as file:
+        _readHeader(file)
+
+        chunkHeaderSize = struct.calcsize(CHUNK_FORMAT)
+
+        while True:
+            header = file.read(chunkHeaderSize)
+
+            if len(header) < chunkHeaderSize:
+                return
+
+            count, itemSize, length = struct.unpack(CHUNK_FORMAT, header)
+            data = zlib.decompress(file.read(length))
+
+            dtype = np.int16 if itemSize == 2 else np.int32
+            coordinateBytes = count * itemSize
+
+            xs = _fromBytePlanes(data[:coordinateBytes], dtype, count).astype(np.int64)
+            ys = _fromBytePlanes(data[coordinateBytes:2*coordinateBytes], dtype, count).astype(np.int64)
+            kinds = np.frombuffer(data[2*coordinateBytes:], dtype=np.int8)
+
+            yield xs, ys, kinds
+
+def readClusterFile(path):
+    """ Returns the x, y coordinates, kinds and metadata of a whole cluster file """
+
+    chunks = list(iterClusterChunks(path))
+
+    if len(chunks) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8), readClusterMeta(path)
+
+    xs, ys, kinds = (np.concatenate(arrays) for arrays in zip(*chunks))
+    return xs, ys, kinds, readClusterMeta(path)
@@ -4,42 +4,157 @@ import matplotlib.widgets as widgets
 
 from components.component_base import ComponentBase
 
+import threading
 import time
 
 class AdderControl(ComponentBase, object):
+    """
+    Grows the cluster on a worker thread, so that the window stays responsive.
+
+    The worker adds the particles in chunks (sized to take about CHUNK_SECONDS each,
+    so that pausing and the other controls never wait long for Lattice.lock). The new
+    particles reach the plot through ParticleEvents, once per frame, and the end of the
+    run is picked up at the first frame after the worker has exited.
+    """
 
     addPerClick = 10
 
     x = 0.005 # x offset of the group panel
     y = 0.09 # y offset of the group panel
 
+    CHUNK_SECONDS = 0.05 # target time of one chunk of particles on the worker thread
+    MIN_CHUNK_SIZE = 8
+
+    worker = None # thread growing the cluster, None when idle
+    targetCount, startCount = 0, 0 # particles to add in the current run and the number of particles before it
+
     def numberSliderCallback(self, val):
         """ Updates the number of points to be added per add-button click """
         self.addPerClick = int(val)
         self.plt.draw()
 
     def addButtonCallback(self, event):
-        """ Adds and plots each point by calling other classes """
+        """ Starts adding particles in the background, or pauses/resumes the current run """
+
+        if self.worker is None:
+            self.start(self.addPerClick)
+        elif self.isRunning.is_set():
+            self.pause()
+        else:
+            self.resume()
+
+    def stopButtonCallback(self, event):
+        """ Cancels the current run (the particles added so far are kept) """
+        self.cancel()
+
+    ''' Background growth '''
+
+    def start(self, count):
+        """ Starts growing count particles on a worker thread """
+
+        if self.worker is not None:
+            print("[Error] <AdderControl::start> Already running")
+            return
+
+        self.targetCount, self.startCount = count, self.program.lattice.particleCount
+        self.executionTime = time.time()
 
-        # show that it is calculating and not crashed
+        self.isRunning = threading.Event()
+        self.isRunning.set()
+        self.isCancelled = False
+
+        self.worker = threading.Thread(target=self._grow, args=(count,), daemon=True)
+        self.worker.start()
+
+        self.buttonHandle.label.set_text("pause")
         self.annotHandle.set(text="Calculating...")
-        self.plt.pause(0.001)
+        self.plt.draw()
+
+    def pause(self):
+        """ Pauses the worker after the current chunk """
+
+        self.isRunning.clear()
+        self.buttonHandle.label.set_text("resume")
+        self.annotHandle.set(text="Paused")
+        self.plt.draw()
+
+    def resume(self):
+        self.isRunning.set()
+        self.buttonHandle.label.set_text("pause")
+        self.annotHandle.set(text="Calculating...")
+        self.plt.draw()
 
-        executionTime = time.time()
+    def cancel(self):
+        """ Stops the worker after the current chunk, the rest is cleaned up at the next frame """
 
-        for _ in range(self.addPerClick):
-            # add a new particle and save the coordinates returned
-            x, y = self.program.lattice.add()
+        if self.worker is None:
+            return
 
-            # call the plot function and pass the coordinates
-            self.program.plotScreen.addParticleAt(x, y)
+        self.isCancelled = True
+        self.isRunning.set() # wake up a paused worker so that it can exit
 
-        executionTime = time.time() - executionTime
-        print("{0:.3f} s".format(executionTime))
+    def _grow(self, count):
+        """ Adds count particles in chunks (runs on the worker thread) """
+
+        lattice = self.program.lattice
+        chunkSize = self.MIN_CHUNK_SIZE
+
+        while count > 0:
+            # blocks while paused
+            self.isRunning.wait()
+
+            if self.isCancelled:
+                break
+
+            chunkTime = time.time()
+            xs, ys = lattice.addMany(min(chunkSize, count))
+            chunkTime = time.time() - chunkTime
+
+            # stop if the map is full
+            if len(xs) < min(chunkSize, count):
+                break
+
+            count -= len(xs)
+
+            # keep each chunk around CHUNK_SECONDS long
+            if chunkTime < self.CHUNK_SECONDS:
+                chunkSize *= 2
+            elif chunkTime > 2 * self.CHUNK_SECONDS:
+                chunkSize = max(chunkSize // 2, self.MIN_CHUNK_SIZE)
+
+    def frameCallback(self):
+        """ Shows the progress of the current run, and cleans up once the worker has exited (called by ParticleEvents) """
+
+        if self.worker is None:
+            return
+
+        if not self.worker.is_alive():
+            self._finish()
+        elif self.isRunning.is_set():
+            self.annotHandle.set(text="{0:d}/{1:d}".format(self.program.lattice.particleCount - self.startCount, self.targetCount))
+
+    def _finish(self):
+        """ Cleans up after the worker has exited """
+
+        self.worker.join()
+        self.worker = None
+
+        # hand over the particles stuck after the start of this frame
+        self.program.particleEvents.flush()
+
+        executionTime = time.time() - self.executionTime
+        stats = self.program.lattice.getStats()
+        print("{0:.3f} s ({1:.0f} particles/s, {2:.3g} moves/particle, {3:.0f}% walking, {4:d} wraps, {5:d} re-entries in total)".format(
+            executionTime, stats["particlesPerSecond"], stats["movesPerParticle"], 100 * stats["walkShare"], stats["wrapCount"], stats["reentryCount"]))
+
+        # save the progress of a memory-mapped lattice
+        if self.program.lattice.arrivalLog is not None:
+            self.program.lattice.checkpoint()
 
         # update plot properties
         self.program.plotScreen.updateAxisLimits()
         self.program.analysisScreen.updatePlot()
+        self.buttonHandle.label.set_text("add")
         self.annotHandle.set(text="")
         self.plt.draw()
 
@@ -51,21 +166,28 @@ class AdderControl(ComponentBase, object):
         self.program = program
         self.plt = plt
 
+        # follow the worker at every frame
+        self.program.particleEvents.addFrameListener(self.frameCallback)
+
         ''' Group Panel and Annotations '''
 
         # add a group panel and set the title
         self.groupAxes = self.addGroupPanel([self.x, self.y, 0.24, 0.11])
         self.addGroupTitle(self.groupAxes, "5. Run", (0.03, 0.72))
 
-        # annotation to show the program is still running and not crashed
+        # annotation to show the progress of the current run
         self.annotHandle = self.addAnnotation("", (0.55, 0.7))
 
         ''' Sliders and Buttons '''
 
         # add a slider for choosing the number of particles to add per click
-        pos = [self.x+0.08, self.y+0.02, 0.12, 0.02]
+        pos = [self.x+0.125, self.y+0.02, 0.08, 0.02]
         self.sliderAxes, self.sliderHandle = self.addSlider(pos, "# ", 1, 3000, self.addPerClick, "%3d", self.numberSliderCallback)
 
-        # add a button for adding particles
-        pos = [self.x+0.01, self.y+0.01, 0.04, 0.05]
+        # add a button for adding particles (pausing/resuming while running)
+        pos = [self.x+0.01, self.y+0.01, 0.045, 0.05]
         self.buttonAxes, self.buttonHandle = self.addButton(pos, "add", self.addButtonCallback)
+
+        # add a button for cancelling the current run
+        pos = [self.x+0.06, self.y+0.01, 0.04, 0.05]
+        self.stopButtonAxes, self.stopButtonHandle = self.addButton(pos, "stop", self.stopButtonCallback)
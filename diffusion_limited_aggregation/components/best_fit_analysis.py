@@ -14,9 +14,11 @@ class BestFitAnalysis(ComponentBase, object):
     limitX, limitY = 0, 0
 
     isLineShown = True
+    isAutoFit = False # the ruler follows the least squares fit over the window
 
     def heightCallback(self, value):
         """ Slider to set the y intersect of the ruler """
+        self.setAutoFit(False)
         self.posY = value
 
         self.program.controlPanel.infoAnalysis.updateY(self.posY)
@@ -25,12 +27,20 @@ class BestFitAnalysis(ComponentBase, object):
 
     def slopeCallback(self, value):
         """ Slider to set the slope of the ruler """
+        self.setAutoFit(False)
         self.slope = value
 
         self.program.controlPanel.infoAnalysis.updateSlope(self.slope)
         self.program.analysisScreen.calculateError()
         self.updateLineEquation()    
 
+    def autoFitButtonCallback(self, event):
+        """ Switches the auto fit mode, where the ruler is the least squares line over the window """
+        self.setAutoFit(not self.isAutoFit)
+
+        self.program.analysisScreen.calculateError()
+        self.updateLineEquation()
+
     def toggleButtonCallback(self, event):
         """ Displays/hides the ruler if clicked """
         if self.isLineShown:
@@ -45,6 +55,7 @@ class BestFitAnalysis(ComponentBase, object):
 
     def yUpCallback(self, event):
         """ Button for finely adjusting the y intersect (increasing way) """
+        self.setAutoFit(False)
         self.posY += 0.01
 
         self.program.controlPanel.infoAnalysis.updateY(self.posY)
@@ -53,6 +64,7 @@ class BestFitAnalysis(ComponentBase, object):
 
     def yDownCallback(self, event):
         """ Button for finely adjusting the y intersect (decreasing way) """
+        self.setAutoFit(False)
         self.posY -= 0.01
 
         self.program.controlPanel.infoAnalysis.updateY(self.posY)
@@ -61,6 +73,7 @@ class BestFitAnalysis(ComponentBase, object):
 
     def slopeUpCallback(self, event):
         """ Button for finely adjusting the slope (increasing way) """
+        self.setAutoFit(False)
         self.slope += 0.01
 
         self.program.controlPanel.infoAnalysis.updateSlope(self.slope)
@@ -69,6 +82,7 @@ class BestFitAnalysis(ComponentBase, object):
 
     def slopeDownCallback(self, event):
         """ Button for finely adjusting the slope (decreasing way) """
+        self.setAutoFit(False)
         self.slope -= 0.01
 
         self.program.controlPanel.infoAnalysis.updateSlope(self.slope)
@@ -129,6 +143,10 @@ class BestFitAnalysis(ComponentBase, object):
         pos = [self.x+0.016, self.y+0.01, 0.08, 0.05]
         self.toggleButtonHandle = self.addButton(pos, "Show/Hide", self.toggleButtonCallback)
 
+        # button for fitting the ruler automatically
+        pos = [self.x+0.136, self.y+0.01, 0.08, 0.05]
+        self.autoFitButtonAxes, self.autoFitButtonHandle = self.addButton(pos, "Auto Fit", self.autoFitButtonCallback)
+
         ''' Buttons for fine adjustments '''
 
         self.addAnnotation("Fine Adjustment", (0.03, 0.35))
@@ -166,6 +184,22 @@ class BestFitAnalysis(ComponentBase, object):
 
         self.plt.draw()
 
+    def setAutoFit(self, isAutoFit):
+        """ Turns the auto fit mode on/off (adjusting the ruler by hand turns it off) """
+        self.isAutoFit = isAutoFit
+        self.autoFitButtonHandle.label.set_text("Manual" if self.isAutoFit else "Auto Fit")
+
+    def setFit(self, slope, intercept):
+        """ Moves the ruler onto the line y = slope * x + intercept (the sliders keep their positions) """
+
+        self.slope = slope
+        self.posY = slope * self.limitX/2 + intercept
+
+        self.program.controlPanel.infoAnalysis.updateSlope(self.slope)
+        self.program.controlPanel.infoAnalysis.updateY(self.posY)
+
+        self.updateLineEquation()
+
     def setXLim(self, x):
         self.limitX = x
 
@@ -14,38 +14,57 @@ class ColourPaletteControl(ComponentBase, object):
 
     ''' Slider callbacks for choosing transition colours '''
 
+    def _updatePalette(self):
+        """ Recolours the plotted particles with the current colours """
+        self.program.plotScreen.setPalette(self.getColour1(), self.getColour2())
+
     def firstRedCallback(self, value):
         self.firstR = value
-        self.program.plotScreen.firstR = value
+        self._updatePalette()
         self.annotHandle1.set(color=[self.firstR, self.firstG, self.firstB])
 
     def firstGreenCallback(self, value):
         self.firstG = value
-        self.program.plotScreen.firstG = value
+        self._updatePalette()
         self.annotHandle1.set(color=[self.firstR, self.firstG, self.firstB])
 
     def firstBlueCallback(self, value):
         self.firstB = value
-        self.program.plotScreen.firstB = value
+        self._updatePalette()
         self.annotHandle1.set(color=[self.firstR, self.firstG, self.firstB])
 
 
     def secondRedCallback(self, value):
         self.secondR = value
-        self.program.plotScreen.secondR = value
+        self._updatePalette()
         self.annotHandle2.set(color=[self.secondR, self.secondG, self.secondB])
 
     def secondGreenCallback(self, value):
         self.secondG = value
-        self.program.plotScreen.secondG = value
+        self._updatePalette()
         self.annotHandle2.set(color=[self.secondR, self.secondG, self.secondB])
 
     def secondBlueCallback(self, value):
         self.secondB = value
-        self.program.plotScreen.secondB = value
+        self._updatePalette()
         self.annotHandle2.set(color=[self.secondR, self.secondG, self.secondB])
 
 
+    def viewModeCallback(self, event):
+        """ Switches the lattice screen between markers and a raster image (for very large clusters) """
+
+        self.setViewMode("RASTER" if self.program.plotScreen.viewMode == "MARKER" else "MARKER")
+        self.plt.draw()
+
+    def setViewMode(self, mode):
+        """ Sets the view mode of the lattice screen ("MARKER" or "RASTER") and the label of the button """
+
+        plotScreen = self.program.plotScreen
+        plotScreen.setViewMode(mode)
+
+        self.viewButtonHandle.label.set_text("Markers" if plotScreen.viewMode == "RASTER" else "Raster")
+
+
     ''' Getters for external use '''
 
     def getColour1(self):
@@ -70,6 +89,10 @@ class ColourPaletteControl(ComponentBase, object):
         self.groupAxes = self.addGroupPanel([self.x, self.y, 0.24, 0.17])
         self.addGroupTitle(self.groupAxes, "3. Colour Palette", (0.03, 0.85))
 
+        # button for switching the lattice view
+        pos = [self.x+0.165, self.y+0.125, 0.065, 0.035]
+        self.viewButtonAxes, self.viewButtonHandle = self.addButton(pos, "Raster", self.viewModeCallback)
+
         ''' Sliders for choosing the first colour '''
 
         alignX = self.x + 0.02
@@ -24,6 +24,15 @@ class InfoAnalysis(ComponentBase, object):
     def updateSlope(self, slope):
         self.slopeHandle.set(text="dy/dx = " + "{0:.2f}".format(slope))
 
+    def updateStats(self, stats):
+        """ Shows the rate, the moves per particle and the share of walking of the engine (see Lattice.getStats) """
+        self.statsHandle.set(text="{0:.0f}/s, {1:.3g} moves, {2:.0f}% walk".format(stats["particlesPerSecond"], stats["movesPerParticle"], 100 * stats["walkShare"]))
+
+    def updateDimensions(self, boxDimension, gyrationDimension):
+        """ Shows the box-counting dimension and the one from the radius of gyration ("-" until there are enough particles) """
+        values = ["-" if np.isnan(value) else "{0:.2f}".format(value) for value in (boxDimension, gyrationDimension)]
+        self.dimensionHandle.set(text="D (box) = {0}, D ($R_g$) = {1}".format(*values))
+
     def updateError(self, error):
         # Rounding a number to its first significant figure by Egveny on StackOverflow (last checked 16 Dec 2021)
         # https://stackoverflow.com/questions/3410976/how-to-round-a-number-to-significant-figures-in-python
@@ -48,21 +57,27 @@ class InfoAnalysis(ComponentBase, object):
         ''' Add information on the panel '''
 
         # show plot axis description
-        self.descriptionHandle = self.addAnnotation("Plot: ", (0.03, 0.62))
+        self.descriptionHandle = self.addAnnotation("Plot: ", (0.03, 0.72))
 
         # show the number of particles
-        self.countHandle = self.addAnnotation("Number of Particles = ", (0.03, 0.5))
+        self.countHandle = self.addAnnotation("Number of Particles = ", (0.03, 0.59))
+
+        # show the engine statistics
+        self.statsHandle = self.addAnnotation("-/s, - moves, -% walk", (0.03, 0.46))
+
+        # show the other estimates of the dimension
+        self.dimensionHandle = self.addAnnotation("D (box) = -, D ($R_g$) = -", (0.03, 0.33))
 
         # show y value
-        self.yHandle = self.addAnnotation("y = ", (0.03, 0.35))
+        self.yHandle = self.addAnnotation("y = ", (0.03, 0.2))
         
         # show dy/dx
-        self.slopeHandle = self.addAnnotation("dy/dx = ", (0.03, 0.2))
+        self.slopeHandle = self.addAnnotation("dy/dx = ", (0.45, 0.2))
 
         # mean squared error in the windowing limits
-        self.errorHandle = self.addAnnotation("Std Err of Slope", (0.03, 0.05))
+        self.errorHandle = self.addAnnotation("Std Err of Slope", (0.03, 0.07))
 
         # initialise panel
-        self.updatePlotDescription("$-y$ versus $x$\n")
+        self.updatePlotDescription("$-y$ versus $x$")
         self.updateY(3)
         self.updateSlope(1.6)
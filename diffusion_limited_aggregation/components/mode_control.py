@@ -15,14 +15,14 @@ class ModeControl(ComponentBase, object):
         """ Displays control screen and updates the axes """
         self.program.plotScreen.showScreen()
         self.program.analysisScreen.hideScreen()
-        self.program.controlPanel.infoAnalysis.updatePlotDescription("$-y$ versus $x$\n")
+        self.program.controlPanel.infoAnalysis.updatePlotDescription("$-y$ versus $x$")
         self.plt.draw()
 
     def analysisModeCallback(self, event):
         """ Displays analysis screen and updates the axes """
         self.program.plotScreen.hideScreen()
         self.program.analysisScreen.showScreen()
-        self.program.controlPanel.infoAnalysis.updatePlotDescription("$log$(# of Particles within Radius)\n        versus $log$(Radius)")
+        self.program.controlPanel.infoAnalysis.updatePlotDescription("$log$(# within R) versus $log$(R)")
         self.plt.draw()
 
     def __init__(self, program, plt):
@@ -4,11 +4,14 @@ import matplotlib.widgets as widgets
 
 from components.component_base import ComponentBase
 
+import cluster_file
+
 class SaveAnalysis(ComponentBase, object):
 
     SERIAL_NUMBER = None
     mapFigCount = 0
     plotFigCount = 0
+    clusterFileCount = 0
 
     x = 0.755
     y = 0.01
@@ -82,6 +85,18 @@ class SaveAnalysis(ComponentBase, object):
         self.annotHandle.set(text=filename)
         self.plt.pause(0.001)
 
+    def saveClusterCallback(self, event):
+        """ Saves the cluster and the settings of the run as a compact file, to be reloaded with main.py --load """
+
+        numParticles = self.program.lattice.particleCount
+
+        self.clusterFileCount += 1
+        filename = "cluster_" + "{0:04d}".format(self.program.UID) + "_{0:02d}".format(self.clusterFileCount) + cluster_file.EXTENSION
+        self.program.lattice.exportCluster("./figures/" + filename)
+
+        self.annotHandle.set(text="{0} ({1:d} particles)".format(filename, numParticles))
+        self.plt.pause(0.001)
+
     def __init__(self, program, plt):
         # initialise the parent class
         super(SaveAnalysis, self).__init__(program, plt)
@@ -93,18 +108,21 @@ class SaveAnalysis(ComponentBase, object):
         ''' Group Panel '''
 
         self.groupAxes = self.addGroupPanel([self.x, self.y, 0.24, 0.15])
-        self.addGroupTitle(self.groupAxes, "7. Save Figures", (0.03, 0.8))
+        self.addGroupTitle(self.groupAxes, "7. Save Figures and Cluster", (0.03, 0.8))
 
         ''' Buttons and Annotations '''
 
-        # buttons for saving the x-y axes and the plot axes
-        buttonX, buttonY = 0.1, 0.05
+        # buttons for saving the x-y axes, the plot axes and the cluster
+        buttonX, buttonY = 0.07, 0.05
 
         pos = [self.x+0.01, self.y+0.01, buttonX, buttonY]
         self.saveXYSpaceHandle = self.addButton(pos, "X-Y Space", self.saveXYCallback)
 
-        pos = [self.x+buttonX+0.03, self.y+0.01, buttonX, buttonY]
-        self.saveLogLogHandle = self.addButton(pos, "Log-Log Space", self.saveLogLogCallback)
+        pos = [self.x+buttonX+0.02, self.y+0.01, buttonX, buttonY]
+        self.saveLogLogHandle = self.addButton(pos, "Log-Log", self.saveLogLogCallback)
+
+        pos = [self.x+2*buttonX+0.03, self.y+0.01, buttonX, buttonY]
+        self.saveClusterHandle = self.addButton(pos, "Cluster", self.saveClusterCallback)
 
         # annotation showing if the plot was saved
         self.annotHandle = self.addAnnotation("", (0.03, 0.55))
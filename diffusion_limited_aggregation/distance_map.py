@@ -0,0 +1,158 @@
+import numpy as np
+import itertools
+import math
+
+class DistanceMap:
+    """
+    A coarse map of lower bounds on the distance to the nearest occupied site.
+
+    The plane is split into square cells of CELL_SIZE sites. Each cell keeps the
+    smallest distance from any point in the cell to any site marked so far, capped
+    at MAX_DISTANCE. Positions are given in x and y coordinates (centred around the
+    origin), and the map grows by itself as sites are marked further away.
+    """
+
+    CELL_SIZE = 8
+    MAX_DISTANCE = 64 # distances are only tracked up to this value
+
+    siteRadius = 0 # distance from the origin to the furthest marked site
+
+    def __init__(self):
+        # start with the cells needed around the origin
+        self.halfCells = 0
+        self.cells = np.full((1, 1), self.MAX_DISTANCE, dtype=np.float32)
+
+        self._ensureCoverage(self.MAX_DISTANCE)
+
+    def _ensureCoverage(self, radius):
+        """ Grows the map (doubling its size) until it covers a square of the given radius """
+
+        if self.halfCells * self.CELL_SIZE >= radius:
+            return
+
+        newHalfCells = max(2 * self.halfCells, radius // self.CELL_SIZE + 1)
+        newCells = np.full((2*newHalfCells + 1, 2*newHalfCells + 1), self.MAX_DISTANCE, dtype=np.float32)
+
+        # copy the old cells into the centre; the new cells are further than
+        # MAX_DISTANCE from every marked site, so the cap is a valid bound for them
+        offset = newHalfCells - self.halfCells
+        size = self.cells.shape[0]
+        newCells[offset:offset+size, offset:offset+size] = self.cells
+
+        self.halfCells = newHalfCells
+        self.cells = newCells
+
+    def markSite(self, x, y):
+        """ Updates the cells around a newly occupied site """
+
+        self.siteRadius = max(self.siteRadius, math.sqrt(x*x + y*y))
+        self._ensureCoverage(int(self.siteRadius) + self.MAX_DISTANCE + self.CELL_SIZE)
+
+        # cell indices (relative to the origin) within MAX_DISTANCE of the site
+        size = self.CELL_SIZE
+        cellXs = np.arange((x - self.MAX_DISTANCE) // size, (x + self.MAX_DISTANCE) // size + 1)
+        cellYs = np.arange((y - self.MAX_DISTANCE) // size, (y + self.MAX_DISTANCE) // size + 1)
+
+        # distance from the site to the closest point of each cell
+        dx = np.maximum(np.maximum(cellXs*size - x, x - (cellXs*size + size - 1)), 0)
+        dy = np.maximum(np.maximum(cellYs*size - y, y - (cellYs*size + size - 1)), 0)
+        distances = np.sqrt(dy[:, None]**2 + dx[None, :]**2)
+
+        rows = slice(cellYs[0] + self.halfCells, cellYs[-1] + self.halfCells + 1)
+        cols = slice(cellXs[0] + self.halfCells, cellXs[-1] + self.halfCells + 1)
+        np.minimum(self.cells[rows, cols], distances, out=self.cells[rows, cols])
+
+    def markSites(self, xs, ys):
+        """ Updates the cells for arrays of newly occupied sites at once (same cells as markSite for each site) """
+
+        if len(xs) == 0:
+            return
+
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+
+        self.siteRadius = max(self.siteRadius, math.sqrt(int((xs*xs + ys*ys).max())))
+        self._ensureCoverage(int(self.siteRadius) + self.MAX_DISTANCE + self.CELL_SIZE)
+
+        size, reach = self.CELL_SIZE, self.MAX_DISTANCE
+        far = reach + 1 # any distance beyond MAX_DISTANCE
+
+        # cells (relative to the origin) within MAX_DISTANCE of any site
+        minX, maxX = int(xs.min()), int(xs.max())
+        minCellX, maxCellX = (minX - reach) // size, (maxX + reach) // size
+        minCellY, maxCellY = (int(ys.min()) - reach) // size, (int(ys.max()) + reach) // size
+
+        width, cellHeight = maxX - minX + 1, maxCellY - minCellY + 1
+
+        # lowest and highest site of each column of sites in each row of cells (far away if there is none),
+        # from the sites sorted by column, row of cells and row
+        keys = np.sort(((xs - minX) * cellHeight + ys // size - minCellY) * size + ys % size)
+        groups = keys // size
+        isFirst = np.concatenate(([True], groups[1:] != groups[:-1]))
+        isLast = np.concatenate((groups[1:] != groups[:-1], [True]))
+        siteRows = (groups % cellHeight + minCellY) * size + keys % size
+
+        lowest = np.full((width, cellHeight), (maxCellY + 1) * size + far, dtype=np.int32)
+        highest = np.full((width, cellHeight), minCellY * size - far, dtype=np.int32)
+        lowest.ravel()[groups[isFirst]] = siteRows[isFirst]
+        highest.ravel()[groups[isLast]] = siteRows[isLast]
+
+        # nearest site in the rows of cells below and above each row of cells, in each column of sites
+        below = np.maximum.accumulate(highest, axis=1)
+        above = np.minimum.accumulate(lowest[:, ::-1], axis=1)[:, ::-1]
+
+        # vertical distance from each column of sites to each row of cells (the rows are the cell ranges)
+        bottoms = (np.arange(cellHeight, dtype=np.int32) + minCellY) * size
+        tops = bottoms + size - 1
+
+        dys = np.full((width, cellHeight), far, dtype=np.int32)
+        dys[:, 1:] = np.minimum(bottoms[1:] - below[:, :-1], far)
+        np.minimum(dys[:, :-1], above[:, 1:] - tops[:-1], out=dys[:, :-1])
+        dys[highest >= lowest] = 0
+
+        # squared distances, with the columns padded to whole cells so that the columns around each cell are slices
+        cellCount, cellPadding = maxCellX - minCellX + 1, reach // size + 1
+        squares = np.full(((cellCount + 2*cellPadding) * size, cellHeight), far * far, dtype=np.int32)
+
+        start = minX - (minCellX - cellPadding) * size
+        squares[start:start+width] = dys * dys
+        squares = squares.reshape(cellCount + 2*cellPadding, size, cellHeight)
+
+        # distance from each cell to the nearest site: the columns inside the cell, then those on either side
+        squaredDistances = squares[cellPadding:cellPadding+cellCount].min(axis=1)
+
+        for offset in itertools.chain(range(-reach, 0), range(size, size + reach)):
+            cellShift, column = divmod(offset, size)
+            dx = -offset if offset < 0 else offset - (size - 1)
+
+            np.minimum(squaredDistances, squares[cellPadding+cellShift:cellPadding+cellShift+cellCount, column] + dx*dx, out=squaredDistances)
+
+        rows = slice(minCellY + self.halfCells, maxCellY + self.halfCells + 1)
+        cols = slice(minCellX + self.halfCells, maxCellX + self.halfCells + 1)
+        np.minimum(self.cells[rows, cols], np.sqrt(squaredDistances.T), out=self.cells[rows, cols])
+
+    def distance(self, x, y):
+        """ Returns a lower bound on the distance from (x, y) to the nearest marked site """
+
+        # every marked site is within siteRadius of the origin
+        farDistance = math.sqrt(x*x + y*y) - self.siteRadius
+
+        row = y // self.CELL_SIZE + self.halfCells
+        col = x // self.CELL_SIZE + self.halfCells
+
+        if 0 <= row < self.cells.shape[0] and 0 <= col < self.cells.shape[1]:
+            return max(farDistance, float(self.cells[row, col]))
+
+        return farDistance
+
+    def distances(self, xs, ys):
+        """ Returns distance() for arrays of positions """
+
+        farDistances = np.sqrt(xs*xs + ys*ys) - self.siteRadius
+
+        rows = ys // self.CELL_SIZE + self.halfCells
+        cols = xs // self.CELL_SIZE + self.halfCells
+
+        isInside = (0 <= rows) & (rows < self.cells.shape[0]) & (0 <= cols) & (cols < self.cells.shape[1])
+        cellDistances = self.cells[np.where(isInside, rows, 0), np.where(isInside, cols, 0)]
+
+        return np.where(isInside, np.maximum(farDistances, cellDistances), farDistances)
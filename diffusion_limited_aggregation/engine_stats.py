@@ -0,0 +1,66 @@
+import numpy as np
+
+class EngineStats:
+    """
+    Counters of the walk engines, to see where the time of a run goes.
+
+    Both engines report the moves (unit steps and long jumps) of every particle that
+    sticks, the walkers wrapped back into the box or re-entered on the launch circle,
+    and the time spent in Lattice.addMany. The time spent registering the particles
+    (map, logs, distance map and observers) is the bookkeeping, the rest is walking.
+    The moves per particle are kept in a histogram with bins of powers of 2.
+    """
+
+    HISTOGRAM_BINS = 64 # bin k: moves with bit length k, i.e. [2^(k-1), 2^k) (0 moves in bin 0)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.particleCount = 0
+        self.moveCount = 0 # unit steps and long jumps
+        self.jumpCount = 0
+        self.wrapCount = 0 # walkers wrapped back into the box ("WRAP")
+        self.reentryCount = 0 # walkers re-entered on the launch circle ("RELAUNCH")
+
+        self.engineTime = 0.0 # time spent in Lattice.addMany, in seconds
+        self.bookkeepingTime = 0.0 # time spent in Lattice._register, in seconds
+
+        self.moveHistogram = np.zeros(self.HISTOGRAM_BINS, dtype=np.int64)
+
+    def recordParticle(self, moves):
+        """ Records a particle that has stuck after a given number of moves """
+
+        self.particleCount += 1
+        self.moveCount += moves
+        self.moveHistogram[moves.bit_length()] += 1
+
+    def recordParticles(self, moves):
+        """ Records particles that have stuck after an array of numbers of moves """
+
+        moves = np.asarray(moves, dtype=np.int64)
+
+        self.particleCount += len(moves)
+        self.moveCount += int(moves.sum())
+
+        # the exponent of frexp is the bit length (0 for 0)
+        self.moveHistogram += np.bincount(np.frexp(moves.astype(np.float64))[1], minlength=self.HISTOGRAM_BINS)
+
+    def getSummary(self):
+        """ Returns the counters and the rates derived from them as a dictionary (JSON-friendly) """
+
+        walkTime = self.engineTime - self.bookkeepingTime
+
+        return {
+            "particleCount": self.particleCount,
+            "moveCount": self.moveCount,
+            "movesPerParticle": self.moveCount / self.particleCount if self.particleCount > 0 else 0.0,
+            "moveHistogram": np.trim_zeros(self.moveHistogram, 'b').tolist(),
+            "jumpCount": self.jumpCount,
+            "wrapCount": self.wrapCount,
+            "reentryCount": self.reentryCount,
+            "particlesPerSecond": self.particleCount / self.engineTime if self.engineTime > 0 else 0.0,
+            "walkSeconds": walkTime,
+            "bookkeepingSeconds": self.bookkeepingTime,
+            "walkShare": walkTime / self.engineTime if self.engineTime > 0 else 0.0,
+        }
@@ -0,0 +1,201 @@
+'''
+Measures the fractal dimension over an ensemble of independent DLA clusters.
+
+Every cluster is grown in its own process (all cores by default) with its own random
+stream, spawned from one seed (np.random.SeedSequence), optionally for several bias
+settings. The mass-radius curve of each cluster (the number of particles within radius
+R, as in the analysis screen) is fitted on a log-log scale, and the slopes are aggregated
+into a mean dimension with a 95% confidence interval for every bias setting. The
+box-counting and radius of gyration estimates of every cluster are averaged alongside,
+as a cross-check of the mass-radius fit.
+
+    python ensemble.py 32 5000 --seed 1 --output ensemble.json
+    python ensemble.py 16 5000 --bias 1 1 1 1 --bias 2 1 1 1
+
+The summary file only depends on the arguments, so a run can be reproduced exactly.
+'''
+
+import numpy as np
+import argparse
+import json
+import multiprocessing
+import os
+
+import headless
+
+# default fitting window in terms of percentage of the largest log(R), as in the analysis screen
+LEFT_PERCENTAGE = 30
+RIGHT_PERCENTAGE = 90
+
+Z_95 = 1.96 # two-sided 95% quantile of the normal distribution
+
+
+def getMassRadius(xs, ys):
+    """ Returns log(R) and log(number of particles within radius R) for R = 1, 2, ... """
+
+    cumulativeCounts = np.cumsum(headless.getCountsPerRadius(xs, ys))
+    radii = np.arange(len(cumulativeCounts))
+
+    # radius 0 has no logarithm, and radii with no particles inside yet are skipped
+    isValid = (radii > 0) & (cumulativeCounts > 0)
+
+    return np.log(radii[isValid]), np.log(cumulativeCounts[isValid])
+
+def fitSlope(logR, logN, leftPercentage=LEFT_PERCENTAGE, rightPercentage=RIGHT_PERCENTAGE):
+    """ Fits a line to the points inside the window and returns the slope and its standard error """
+
+    leftLimit, rightLimit = logR[-1] * leftPercentage / 100, logR[-1] * rightPercentage / 100
+    isInside = (leftLimit <= logR) & (logR <= rightLimit)
+
+    x, y = logR[isInside], logN[isInside]
+
+    # at least 3 points are needed for the error
+    if len(x) < 3:
+        return float("nan"), float("nan")
+
+    slope, intercept = np.polyfit(x, y, 1)
+    ssr = np.sum((y - slope*x - intercept) ** 2) / (len(x) - 2)
+
+    return float(slope), float(np.sqrt(ssr / np.sum((x - x.mean()) ** 2)))
+
+def getJSONNumber(value):
+    """ Returns a value as a float, or None if it is not finite (JSON has no NaN) """
+    return float(value) if np.isfinite(value) else None
+
+def getFiniteMean(values):
+    """ Returns the mean of the finite values (None stands for NaN), or None if there is none """
+
+    values = np.array(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+
+    return float(np.mean(values)) if len(values) > 0 else None
+
+def formatNumber(value):
+    """ Returns a value with 3 decimals for printing, or "n/a" for None """
+    return "n/a" if value is None else "{0:.3f}".format(value)
+
+def getGroupSettings(bias, settings):
+    """ Returns the settings of one bias setting: re-entry is only exact without bias, so a biased walk is wrapped (see Lattice.setBoundaryMode) """
+
+    if bias is not None and len(set(bias)) > 1 and settings.get("boundaryMode") == "RELAUNCH":
+        return {**settings, "boundaryMode": "WRAP"}
+
+    return settings
+
+def runCluster(job):
+    """ Grows one cluster and returns its mass-radius curve and fitted dimension (runs in a worker process) """
+
+    _, xs, ys = headless.grow(job["count"], job["seedSequence"], job["bias"], **job["settings"])
+    logR, logN = getMassRadius(xs, ys)
+    dimension, error = fitSlope(logR, logN, job["leftPercentage"], job["rightPercentage"])
+    boxCounting, radiusOfGyration = headless.getEstimators(xs, ys)
+
+    return {
+        "spawnKey": list(job["seedSequence"].spawn_key),
+        "bias": job["bias"],
+        "boundaryMode": job["settings"]["boundaryMode"],
+        "dimension": getJSONNumber(dimension),
+        "error": getJSONNumber(error),
+        "boxDimension": getJSONNumber(boxCounting.getDimension()),
+        "gyrationDimension": getJSONNumber(radiusOfGyration.getDimension()),
+        "logR": logR.tolist(),
+        "logN": logN.tolist(),
+    }
+
+def summarise(results):
+    """ Aggregates the runs of one bias setting into a mean dimension and a mean mass-radius curve """
+
+    # the fits that failed (None) are left out
+    dimensions = np.array([result["dimension"] for result in results], dtype=np.float64)
+    dimensions = dimensions[np.isfinite(dimensions)]
+
+    mean = getFiniteMean(dimensions)
+    halfWidth = float(Z_95 * np.std(dimensions, ddof=1) / np.sqrt(len(dimensions))) if len(dimensions) > 1 else None
+
+    # mean curve over the radii that every run reached, with a 95% band for the mean
+    length = min(len(result["logN"]) for result in results)
+    curves = np.array([result["logN"][:length] for result in results])
+    curveHalfWidth = Z_95 * np.std(curves, axis=0, ddof=1) / np.sqrt(len(results)) if len(results) > 1 else np.zeros(length)
+
+    return {
+        "bias": results[0]["bias"],
+        "boundaryMode": results[0]["boundaryMode"],
+        "runs": len(results),
+        "dimension": mean,
+        "confidenceInterval": [mean - halfWidth, mean + halfWidth] if halfWidth is not None else [None, None],
+        "boxDimension": getFiniteMean([result["boxDimension"] for result in results]),
+        "gyrationDimension": getFiniteMean([result["gyrationDimension"] for result in results]),
+        "logR": results[0]["logR"][:length],
+        "meanLogN": curves.mean(axis=0).tolist(),
+        "bandLogN": [(curves.mean(axis=0) - curveHalfWidth).tolist(), (curves.mean(axis=0) + curveHalfWidth).tolist()],
+        "clusters": [{key: result[key] for key in ("spawnKey", "dimension", "error", "boxDimension", "gyrationDimension")} for result in results],
+    }
+
+def runEnsemble(runs, count, seed=1, biases=(None,), processes=None, leftPercentage=LEFT_PERCENTAGE,
+                rightPercentage=RIGHT_PERCENTAGE, **settings):
+    """ Grows runs clusters of count particles for every bias setting and returns the summary.
+
+    Parameters
+        seed: root seed, every cluster draws from its own child stream spawned from it
+        biases: bias settings to sweep (None for no bias), see headless.grow
+        processes: number of worker processes (None for all cores)
+        settings: walk and boundary modes etc., see headless.grow
+    """
+
+    # unbiased re-entry and long jumps by default, for correct statistics at large radii (the biased groups are wrapped)
+    settings.setdefault("walkMode", "JUMP")
+    settings.setdefault("boundaryMode", "RELAUNCH")
+
+    # independent streams for the clusters, the same ones for every bias setting
+    seedSequences = np.random.SeedSequence(seed).spawn(runs)
+
+    jobs = [{
+        "count": count,
+        "seedSequence": seedSequences[i],
+        "bias": None if bias is None else list(bias),
+        "settings": getGroupSettings(bias, settings),
+        "leftPercentage": leftPercentage,
+        "rightPercentage": rightPercentage,
+    } for bias in biases for i in range(runs)]
+
+    with multiprocessing.Pool(processes or os.cpu_count()) as pool:
+        results = pool.map(runCluster, jobs, chunksize=1)
+
+    return {
+        "runs": runs,
+        "count": count,
+        "seed": seed,
+        "settings": settings,
+        "window": [leftPercentage, rightPercentage],
+        "groups": [summarise(results[i:i+runs]) for i in range(0, len(results), runs)],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the fractal dimension over many DLA clusters")
+    parser.add_argument("runs", type=int, help="number of clusters per bias setting")
+    parser.add_argument("count", type=int, help="number of particles per cluster")
+    parser.add_argument("--seed", type=int, default=1, help="root random seed of the ensemble")
+    parser.add_argument("--bias", type=float, nargs="+", action="append", help="bias setting to sweep, in the order of the stencil (can be repeated)")
+    parser.add_argument("--processes", type=int, help="number of worker processes (default: all cores)")
+    parser.add_argument("--window", type=float, nargs=2, default=[LEFT_PERCENTAGE, RIGHT_PERCENTAGE], metavar=("LEFT", "RIGHT"), help="fitting window in percentage of log(R)")
+    parser.add_argument("--backend", default="DENSE", choices=["DENSE", "BITPACKED", "TILED"])
+    parser.add_argument("--walk", default="JUMP", choices=["UNIT", "JUMP"])
+    parser.add_argument("--boundary", default="RELAUNCH", choices=["WRAP", "RELAUNCH"])
+    parser.add_argument("--stencil", default="FOUR", choices=["FOUR", "EIGHT"])
+    parser.add_argument("--output", default="ensemble.json", help="summary file")
+    args = parser.parse_args()
+
+    summary = runEnsemble(args.runs, args.count, args.seed, args.bias or [None], args.processes, args.window[0], args.window[1],
+                          backend=args.backend, walkMode=args.walk, boundaryMode=args.boundary, stencil=args.stencil)
+
+    with open(args.output, 'w') as file:
+        json.dump(summary, file, indent=4, allow_nan=False)
+
+    for group in summary["groups"]:
+        low, high = group["confidenceInterval"]
+        print("bias {0} ({7}): dimension {1} (95% CI {2} - {3}, {4:d} runs), box-counting {5}, radius of gyration {6}".format(
+            group["bias"], formatNumber(group["dimension"]), formatNumber(low), formatNumber(high), group["runs"],
+            formatNumber(group["boxDimension"]), formatNumber(group["gyrationDimension"]), group["boundaryMode"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import numpy as np
+import math
+
+class BoxCounting:
+    """
+    Number of boxes of size 2^k (k = 0 .. SCALES-1) holding at least one site, updated as sites are added.
+
+    The boxes are aligned to multiples of their size, so a box of size 2^(k+1) is made
+    of 4 boxes of size 2^k. The occupied boxes of each scale are kept as a sorted array
+    of integer keys, and new sites are looked up with a binary search. Only the boxes
+    that were not occupied yet are looked up at the next coarser scale, so most sites
+    stop after one or two scales. The sites are assumed to be distinct (as on the
+    lattice), so boxes of size 1 are not stored.
+    """
+
+    SCALES = 16 # boxes of size 1 to 32768
+    MIN_BOX_SIZE = 8 # smaller boxes resolve the branches of the lattice rather than the cluster
+    MIN_BOX_COUNT = 16 # coarser scales have too few boxes to be fitted
+
+    siteCount = 0
+
+    def __init__(self):
+        # occupied boxes of size 2^k for k >= 1, as sorted integer keys (see BoxCounting._getKeys)
+        self.boxes = [np.zeros(0, dtype=np.int64) for _ in range(self.SCALES)]
+
+    @staticmethod
+    def _getKeys(boxXs, boxYs):
+        """ Returns one integer per box (box indices are well within 32 bits) """
+        return (boxXs << 32) + boxYs
+
+    @staticmethod
+    def _getBoxes(keys):
+        """ Returns the box indices of integer keys (inverse of BoxCounting._getKeys) """
+
+        boxYs = ((keys + 2**31) & 0xFFFFFFFF) - 2**31
+        return (keys - boxYs) >> 32, boxYs
+
+    def addSite(self, x, y):
+        """ Registers a new site at the given x, y coordinates """
+        self.addSites([x], [y])
+
+    def addSites(self, xs, ys):
+        """ Registers arrays of new sites """
+
+        boxXs, boxYs = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        self.siteCount += len(boxXs)
+
+        for k in range(1, self.SCALES):
+            # the distinct boxes holding the sites (sorting is faster than np.unique)
+            keys = np.sort(self._getKeys(boxXs >> 1, boxYs >> 1))
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+
+            # only the boxes that were not occupied yet, the coarser boxes holding the others are occupied as well
+            boxes = self.boxes[k]
+            positions = np.searchsorted(boxes, keys)
+
+            isNew = positions == len(boxes)
+            isNew[~isNew] = boxes[positions[~isNew]] != keys[~isNew]
+
+            if not isNew.any():
+                return
+
+            keys, positions = keys[isNew], positions[isNew]
+            self.boxes[k] = np.insert(boxes, positions, keys)
+
+            # the new boxes of this scale are the sites of the next one
+            boxXs, boxYs = self._getBoxes(keys)
+
+    def getCounts(self):
+        """ Returns the box sizes and the number of occupied boxes of each size """
+        return 2 ** np.arange(self.SCALES), np.array([self.siteCount] + [len(boxes) for boxes in self.boxes[1:]])
+
+    def getDimension(self):
+        """ Returns the slope of -log(number of boxes) versus log(box size), or nan if there are too few scales to fit """
+
+        sizes, counts = self.getCounts()
+        isValid = (sizes >= self.MIN_BOX_SIZE) & (counts >= self.MIN_BOX_COUNT)
+
+        if np.count_nonzero(isValid) < 3:
+            return float("nan")
+
+        slope = np.polyfit(np.log(sizes[isValid]), np.log(counts[isValid]), 1)[0]
+        return float(-slope)
+
+class RadiusOfGyration:
+    """
+    Radius of gyration of the first N sites for every N, updated as sites are added.
+
+    The running sums of x, y and x^2 + y^2 give the radius of gyration after each new
+    site in O(1), and the values are kept in a NumPy array that doubles in size when
+    full. Its growth R_g ~ N^(1/D) is another estimate of the dimension D.
+    """
+
+    INITIAL_CAPACITY = 1024
+    FIT_POINTS = 64 # number of log-spaced N values fitted
+    MIN_FIT_COUNT = 100 # smaller clusters are dominated by the lattice and the seeds
+
+    count = 0
+    sumX, sumY, sumSquares = 0.0, 0.0, 0.0
+
+    def __init__(self):
+        # radius of gyration of the first n sites at index n-1
+        self.radii = np.zeros(self.INITIAL_CAPACITY)
+
+    def _reserve(self, capacity):
+        """ Grows the array (doubling its size) until it holds at least capacity values """
+
+        if capacity <= len(self.radii):
+            return
+
+        newCapacity = len(self.radii)
+
+        while newCapacity < capacity:
+            newCapacity *= 2
+
+        newRadii = np.zeros(newCapacity)
+        newRadii[:self.count] = self.radii[:self.count]
+        self.radii = newRadii
+
+    def addSite(self, x, y):
+        """ Registers a new site at the given x, y coordinates """
+
+        self._reserve(self.count + 1)
+
+        self.count += 1
+        self.sumX += x
+        self.sumY += y
+        self.sumSquares += x*x + y*y
+
+        meanX, meanY = self.sumX / self.count, self.sumY / self.count
+        self.radii[self.count - 1] = math.sqrt(max(self.sumSquares / self.count - meanX*meanX - meanY*meanY, 0))
+
+    def addSites(self, xs, ys):
+        """ Registers arrays of new sites """
+
+        xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+
+        if len(xs) == 0:
+            return
+
+        start, end = self.count, self.count + len(xs)
+        self._reserve(end)
+
+        # running sums after each new site
+        counts = np.arange(start + 1, end + 1)
+        sumX = self.sumX + np.cumsum(xs)
+        sumY = self.sumY + np.cumsum(ys)
+        sumSquares = self.sumSquares + np.cumsum(xs*xs + ys*ys)
+
+        self.radii[start:end] = np.sqrt(np.maximum(sumSquares / counts - (sumX / counts)**2 - (sumY / counts)**2, 0))
+
+        self.count = end
+        self.sumX, self.sumY, self.sumSquares = float(sumX[-1]), float(sumY[-1]), float(sumSquares[-1])
+
+    def getRadii(self):
+        """ Returns N = 1, 2, ... and the radius of gyration of the first N sites (a view, not a copy) """
+        return np.arange(1, self.count + 1), self.radii[:self.count]
+
+    def getDimension(self):
+        """ Returns 1 / slope of log(R_g) versus log(N), or nan if the cluster is too small to fit """
+
+        if self.count < 2 * self.MIN_FIT_COUNT:
+            return float("nan")
+
+        # log-spaced N, so that the fit costs the same for any cluster size
+        counts = np.unique(np.geomspace(self.MIN_FIT_COUNT, self.count, self.FIT_POINTS).astype(np.int64))
+
+        slope = np.polyfit(np.log(counts), np.log(self.radii[counts - 1]), 1)[0]
+        return float(1 / slope)
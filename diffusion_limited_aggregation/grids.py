@@ -0,0 +1,459 @@
+import numpy as np
+
+# row and column offsets of the neighbours a walker sticks to (the 4 nearest by default)
+NEIGHBOUR_OFFSETS = ((0, 1), (-1, 0), (0, -1), (1, 0))
+
+class DenseGrid:
+    """
+    Occupancy grid stored as one contiguous NumPy array of a fixed size.
+
+    Positions are given in terms of row and column, in range [0, size). The array
+    has an empty border of PADDING sites, so the neighbours of any position in the
+    boundary can be read without checking the boundary again.
+
+    A second array (the sticky mask) marks the sites next to an occupied site, and is
+    updated whenever a site is set, so a contact test is a single read. The empty
+    sticky sites are the perimeter of the cluster, where the next particle may stick.
+    The neighbours are given by offsets, each row and column offset in [-1, 1].
+    """
+
+    PADDING = 1
+
+    def __init__(self, size, offsets=NEIGHBOUR_OFFSETS):
+        self.size = size
+        self.offsets = tuple(offsets)
+        self.offsetRows, self.offsetCols = np.array(self.offsets).T
+
+        # indexed as array[row + PADDING, col + PADDING]
+        self.array = np.zeros((size + 2*self.PADDING, size + 2*self.PADDING), dtype=np.bool_)
+        self.sticky = np.zeros_like(self.array)
+
+    def isInBoundary(self, row, col):
+        """ Returns True iff a given position is in the grid (not out of boundary). """
+        return (0 <= row < self.size) and (0 <= col < self.size)
+
+    def getRadiusLimit(self, centre):
+        """ Returns how far (in rows or columns) a walker may go from the centre """
+        return min(centre, self.size - 1 - centre)
+
+    def get(self, row, col):
+        """ Returns the boolean value at a given position if it is in the boundary """
+        return bool(self.array[row + self.PADDING, col + self.PADDING]) if self.isInBoundary(row, col) else False
+
+    def set(self, row, col, value):
+        """ Sets the value at a given position, which must be in the boundary, and updates the sticky mask """
+
+        row += self.PADDING
+        col += self.PADDING
+        self.array[row, col] = value
+
+        # the offsets are symmetric, so the sites touching this one are its neighbours
+        if value:
+            self.sticky[row + self.offsetRows, col + self.offsetCols] = True
+        else:
+            # the neighbours may still touch other particles
+            self._refreshSticky(row + self.offsetRows, col + self.offsetCols)
+
+    def setMany(self, rows, cols):
+        """ Occupies arrays of positions (all in the boundary) at once and updates the sticky mask """
+
+        rows, cols = rows + self.PADDING, cols + self.PADDING
+        self.array[rows, cols] = True
+
+        for rowOffset, colOffset in self.offsets:
+            self.sticky[rows + rowOffset, cols + colOffset] = True
+
+    def _refreshSticky(self, rows, cols):
+        """ Recalculates the sticky mask at arrays of padded positions (those outside the boundary are skipped) """
+
+        isInside = (self.PADDING <= rows) & (rows < self.size + self.PADDING) & (self.PADDING <= cols) & (cols < self.size + self.PADDING)
+        rows, cols = rows[isInside], cols[isInside]
+
+        isTouching = np.zeros(len(rows), dtype=np.bool_)
+
+        for rowOffset, colOffset in self.offsets:
+            isTouching |= self.array[rows + rowOffset, cols + colOffset]
+
+        self.sticky[rows, cols] = isTouching
+
+    def _rebuildSticky(self):
+        """ Recalculates the whole sticky mask from the occupied sites """
+
+        array, sticky = self.array, self.sticky
+        sticky.fill(False)
+
+        # sticky[row, col] |= array[row + rowOffset, col + colOffset] for the whole array at once
+        length = array.shape[0]
+
+        for rowOffset, colOffset in self.offsets:
+            targetRows = slice(max(-rowOffset, 0), length - max(rowOffset, 0))
+            targetCols = slice(max(-colOffset, 0), length - max(colOffset, 0))
+            sourceRows = slice(max(rowOffset, 0), length - max(-rowOffset, 0))
+            sourceCols = slice(max(colOffset, 0), length - max(-colOffset, 0))
+
+            sticky[targetRows, targetCols] |= array[sourceRows, sourceCols]
+
+    def hasNeighbour(self, row, col):
+        """ Returns True iff there is at least one adjacent particle around (position must be in the boundary) """
+        return self.sticky[row + self.PADDING, col + self.PADDING]
+
+    def hasNeighbours(self, rows, cols):
+        """ Returns hasNeighbour for arrays of positions (all in the boundary) """
+        return self.sticky[rows + self.PADDING, cols + self.PADDING]
+
+    def getOccupied(self):
+        """ Returns the rows and columns of all occupied positions """
+
+        rows, cols = np.nonzero(self.array)
+        return rows - self.PADDING, cols - self.PADDING
+
+    def getPerimeter(self):
+        """ Returns the rows and columns of the empty sites next to an occupied site (in the boundary) """
+
+        inside = slice(self.PADDING, self.size + self.PADDING)
+        rows, cols = np.nonzero(self.sticky[inside, inside] & ~self.array[inside, inside])
+
+        return rows, cols
+
+    def clear(self):
+        """ Fills the grid with False """
+        self.array.fill(False)
+        self.sticky.fill(False)
+
+
+class MappedGrid(DenseGrid):
+    """
+    DenseGrid whose array lives in a memory-mapped file on disk, so that a run can be
+    checkpointed and resumed later without holding a second copy of the map in memory.
+    The sticky mask lives in a second memory-mapped file (stickyPath, next to the array if
+    None), which is not part of the checkpoint and is rebuilt from the array when opened.
+    """
+
+    def __init__(self, size, path, isNew=True, offsets=NEIGHBOUR_OFFSETS, stickyPath=None):
+        self.size = size
+        self.path = path
+        self.offsets = tuple(offsets)
+        self.offsetRows, self.offsetCols = np.array(self.offsets).T
+
+        # a new file is created filled with False, an existing file is opened as it is
+        shape = (size + 2*self.PADDING, size + 2*self.PADDING)
+        self.memmap = np.memmap(path, dtype=np.bool_, mode='w+' if isNew else 'r+', shape=shape)
+
+        # plain array view of the same memory, which is faster to index than the memmap
+        self.array = self.memmap.view(np.ndarray)
+
+        # the sticky mask is always rebuilt, a crash may have left the file out of step with the array
+        self.stickyMemmap = np.memmap(path + ".sticky" if stickyPath is None else stickyPath, dtype=np.bool_, mode='w+', shape=shape)
+        self.sticky = self.stickyMemmap.view(np.ndarray)
+        self._rebuildSticky()
+
+    def flush(self):
+        """ Writes any changes in memory to the file """
+        self.memmap.flush()
+
+
+class BitPackedGrid:
+    """
+    Occupancy grid of a fixed size storing one bit per site in uint64 words.
+
+    Uses 8 times less memory than DenseGrid, for very large maps. Site (row, col)
+    is bit (col + 1) % 64 of words[row + 1, (col + 1) // 64]; the extra row at the top
+    and bottom and the extra bit on the left make an empty border, like DenseGrid.
+    The sticky mask (see DenseGrid) is packed in the same way in stickyWords.
+    """
+
+    WORD_SHIFT = 6
+    WORD_MASK = 63
+    FULL_WORD = (1 << 64) - 1
+
+    # rows unpacked at once when listing the occupied positions
+    UNPACK_ROWS = 1024
+
+    def __init__(self, size, offsets=NEIGHBOUR_OFFSETS):
+        self.size = size
+        self.offsets = tuple(offsets)
+
+        numWords = ((size + 2) >> self.WORD_SHIFT) + 1
+        self.words = np.zeros((size + 2, numWords), dtype=np.uint64)
+        self.stickyWords = np.zeros_like(self.words)
+
+    def isInBoundary(self, row, col):
+        """ Returns True iff a given position is in the grid (not out of boundary). """
+        return (0 <= row < self.size) and (0 <= col < self.size)
+
+    def getRadiusLimit(self, centre):
+        """ Returns how far (in rows or columns) a walker may go from the centre """
+        return min(centre, self.size - 1 - centre)
+
+    def get(self, row, col):
+        """ Returns the boolean value at a given position if it is in the boundary """
+
+        if not self.isInBoundary(row, col):
+            return False
+
+        col += 1
+        return (self.words.item(row + 1, col >> self.WORD_SHIFT) >> (col & self.WORD_MASK)) & 1 == 1
+
+    def _setBit(self, words, row, col, value):
+        """ Sets a bit of words in terms of the padded row and column """
+
+        word, mask = col >> self.WORD_SHIFT, 1 << (col & self.WORD_MASK)
+
+        if value:
+            words[row, word] = words.item(row, word) | mask
+        else:
+            words[row, word] = words.item(row, word) & (self.FULL_WORD ^ mask)
+
+    def set(self, row, col, value):
+        """ Sets the value at a given position, which must be in the boundary, and updates the sticky mask """
+
+        row, col = int(row), int(col)
+        self._setBit(self.words, row + 1, col + 1, value)
+
+        for rowOffset, colOffset in self.offsets:
+            neighbourRow, neighbourCol = row + rowOffset, col + colOffset
+
+            # the neighbours may still touch other particles when a site is cleared
+            if value or self.isInBoundary(neighbourRow, neighbourCol):
+                self._setBit(self.stickyWords, neighbourRow + 1, neighbourCol + 1, value or self._isTouching(neighbourRow, neighbourCol))
+
+    def _setBits(self, words, rows, cols):
+        """ Sets the bits of words at arrays of padded rows and columns """
+
+        indices = rows * words.shape[1] + (cols >> self.WORD_SHIFT)
+        masks = np.left_shift(np.uint64(1), (cols & self.WORD_MASK).astype(np.uint64))
+
+        # combine the bits falling into the same word first
+        order = np.argsort(indices)
+        indices, masks = indices[order], masks[order]
+        starts = np.flatnonzero(np.concatenate(([True], indices[1:] != indices[:-1])))
+
+        words.ravel()[indices[starts]] |= np.bitwise_or.reduceat(masks, starts)
+
+    def setMany(self, rows, cols):
+        """ Occupies arrays of positions (all in the boundary) at once and updates the sticky mask """
+
+        if len(rows) == 0:
+            return
+
+        rows, cols = np.asarray(rows, dtype=np.int64) + 1, np.asarray(cols, dtype=np.int64) + 1
+        self._setBits(self.words, rows, cols)
+
+        for rowOffset, colOffset in self.offsets:
+            self._setBits(self.stickyWords, rows + rowOffset, cols + colOffset)
+
+    def hasNeighbour(self, row, col):
+        """ Returns True iff there is at least one adjacent particle around (position must be in the boundary) """
+
+        col += 1
+        return (self.stickyWords.item(row + 1, col >> self.WORD_SHIFT) >> (col & self.WORD_MASK)) & 1 == 1
+
+    def _isTouching(self, row, col):
+        """ Returns True iff a position in the boundary has an adjacent particle, read from the occupied words """
+        return any(self.get(row + rowOffset, col + colOffset) for rowOffset, colOffset in self.offsets)
+
+    def _getBits(self, words, rows, cols):
+        """ Returns the bits of words at arrays of positions in terms of the padded rows and columns """
+
+        words = words[rows, cols >> self.WORD_SHIFT]
+        return (words >> (cols & self.WORD_MASK).astype(np.uint64)) & np.uint64(1) == 1
+
+    def hasNeighbours(self, rows, cols):
+        """ Returns hasNeighbour for arrays of positions (all in the boundary) """
+        return self._getBits(self.stickyWords, rows + 1, cols + 1)
+
+    def _getSetBits(self, getBand):
+        """ Returns the rows and columns of the set bits of the bands of words returned by getBand(start, end) """
+
+        allRows, allCols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+
+        # unpack a band of rows at a time to keep the temporary array small
+        for start in range(0, self.words.shape[0], self.UNPACK_ROWS):
+            band = np.ascontiguousarray(getBand(start, start + self.UNPACK_ROWS))
+            bits = np.unpackbits(band.view(np.uint8), axis=1, bitorder='little')
+
+            rows, cols = np.nonzero(bits)
+            allRows.append(rows + start - 1)
+            allCols.append(cols - 1)
+
+        return np.concatenate(allRows), np.concatenate(allCols)
+
+    def getOccupied(self):
+        """ Returns the rows and columns of all occupied positions """
+        return self._getSetBits(lambda start, end: self.words[start:end])
+
+    def getPerimeter(self):
+        """ Returns the rows and columns of the empty sites next to an occupied site (in the boundary) """
+
+        rows, cols = self._getSetBits(lambda start, end: self.stickyWords[start:end] & ~self.words[start:end])
+        isInside = (0 <= rows) & (rows < self.size) & (0 <= cols) & (cols < self.size)
+
+        return rows[isInside], cols[isInside]
+
+    def clear(self):
+        """ Fills the grid with False """
+        self.words.fill(0)
+        self.stickyWords.fill(0)
+
+
+class TiledGrid:
+    """
+    Unbounded occupancy grid made of fixed-size NumPy tiles.
+
+    Tiles are kept in a dictionary keyed by tile coordinate and only allocated when
+    a position in them is set, so the memory grows with the footprint of the cluster
+    and not with the square of its radius. Any integer row and column is valid.
+    The sticky mask (see DenseGrid) is kept in a second dictionary of tiles.
+    """
+
+    TILE_SHIFT = 6
+    TILE_SIZE = 1 << TILE_SHIFT # 64 x 64 sites per tile
+    TILE_MASK = TILE_SIZE - 1
+
+    def __init__(self, offsets=NEIGHBOUR_OFFSETS):
+        self.offsets = tuple(offsets)
+        self.tiles = {}
+        self.stickyTiles = {}
+
+    def isInBoundary(self, row, col):
+        """ Every position is in the boundary """
+        return True
+
+    def getRadiusLimit(self, centre):
+        """ Returns how far (in rows or columns) a walker may go from the centre """
+        return float("inf")
+
+    def get(self, row, col):
+        """ Returns the boolean value at a given position """
+
+        tile = self.tiles.get((row >> self.TILE_SHIFT, col >> self.TILE_SHIFT))
+        return tile is not None and bool(tile[row & self.TILE_MASK, col & self.TILE_MASK])
+
+    def _setInTiles(self, tiles, row, col, value):
+        """ Sets the value at a given position of a dictionary of tiles, allocating the tile if needed """
+
+        key = (row >> self.TILE_SHIFT, col >> self.TILE_SHIFT)
+        tile = tiles.get(key)
+
+        if tile is None:
+            # nothing to clear in a tile that does not exist
+            if not value:
+                return
+
+            tile = tiles[key] = np.zeros((self.TILE_SIZE, self.TILE_SIZE), dtype=np.bool_)
+
+        tile[row & self.TILE_MASK, col & self.TILE_MASK] = value
+
+    def set(self, row, col, value):
+        """ Sets the value at a given position, allocating its tile if needed, and updates the sticky mask """
+
+        self._setInTiles(self.tiles, row, col, value)
+
+        for rowOffset, colOffset in self.offsets:
+            neighbourRow, neighbourCol = row + rowOffset, col + colOffset
+
+            # the neighbours may still touch other particles when a site is cleared
+            self._setInTiles(self.stickyTiles, neighbourRow, neighbourCol, value or self._isTouching(neighbourRow, neighbourCol))
+
+    def _setManyInTiles(self, tiles, rows, cols):
+        """ Sets arrays of positions of a dictionary of tiles to True, allocating the tiles if needed """
+
+        tileRows, tileCols = rows >> self.TILE_SHIFT, cols >> self.TILE_SHIFT
+
+        # one assignment per tile, the positions grouped by tile (one integer per tile)
+        keys = (tileRows << 32) + tileCols
+        order = np.argsort(keys)
+        keys, tileRows, tileCols, rows, cols = keys[order], tileRows[order], tileCols[order], rows[order] & self.TILE_MASK, cols[order] & self.TILE_MASK
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        ends = np.append(starts[1:], len(rows))
+
+        for start, end, key in zip(starts.tolist(), ends.tolist(), zip(tileRows[starts].tolist(), tileCols[starts].tolist())):
+            tile = tiles.get(key)
+
+            if tile is None:
+                tile = tiles[key] = np.zeros((self.TILE_SIZE, self.TILE_SIZE), dtype=np.bool_)
+
+            tile[rows[start:end], cols[start:end]] = True
+
+    def setMany(self, rows, cols):
+        """ Occupies arrays of positions at once, allocating their tiles if needed, and updates the sticky mask """
+
+        if len(rows) == 0:
+            return
+
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        self._setManyInTiles(self.tiles, rows, cols)
+
+        for rowOffset, colOffset in self.offsets:
+            self._setManyInTiles(self.stickyTiles, rows + rowOffset, cols + colOffset)
+
+    def hasNeighbour(self, row, col):
+        """ Returns True iff there is at least one adjacent particle around """
+
+        tile = self.stickyTiles.get((row >> self.TILE_SHIFT, col >> self.TILE_SHIFT))
+        return tile is not None and bool(tile[row & self.TILE_MASK, col & self.TILE_MASK])
+
+    def _isTouching(self, row, col):
+        """ Returns True iff a position has an adjacent particle, read from the occupied tiles """
+        return any(self.get(row + rowOffset, col + colOffset) for rowOffset, colOffset in self.offsets)
+
+    def _getManyInTiles(self, tiles, rows, cols):
+        """ Returns the values of a dictionary of tiles at arrays of positions, read one tile at a time """
+
+        values = np.zeros(len(rows), dtype=np.bool_)
+
+        if len(rows) == 0:
+            return values
+
+        tileRows, tileCols = rows >> self.TILE_SHIFT, cols >> self.TILE_SHIFT
+
+        # the positions grouped by tile (one integer per tile), as in _setManyInTiles
+        keys = (tileRows << 32) + tileCols
+        order = np.argsort(keys)
+        keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        ends = np.append(starts[1:], len(rows))
+
+        for start, end, key in zip(starts.tolist(), ends.tolist(), zip(tileRows[order[starts]].tolist(), tileCols[order[starts]].tolist())):
+            tile = tiles.get(key)
+
+            if tile is not None:
+                positions = order[start:end]
+                values[positions] = tile[rows[positions] & self.TILE_MASK, cols[positions] & self.TILE_MASK]
+
+        return values
+
+    def hasNeighbours(self, rows, cols):
+        """ Returns hasNeighbour for arrays of positions """
+        return self._getManyInTiles(self.stickyTiles, np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))
+
+    def getOccupied(self):
+        """ Returns the rows and columns of all occupied positions """
+
+        allRows, allCols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+
+        for (tileRow, tileCol), tile in self.tiles.items():
+            rows, cols = np.nonzero(tile)
+            allRows.append(rows + (tileRow << self.TILE_SHIFT))
+            allCols.append(cols + (tileCol << self.TILE_SHIFT))
+
+        return np.concatenate(allRows), np.concatenate(allCols)
+
+    def getPerimeter(self):
+        """ Returns the rows and columns of the empty sites next to an occupied site """
+
+        allRows, allCols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+
+        for (tileRow, tileCol), stickyTile in self.stickyTiles.items():
+            tile = self.tiles.get((tileRow, tileCol))
+            rows, cols = np.nonzero(stickyTile if tile is None else stickyTile & ~tile)
+
+            allRows.append(rows + (tileRow << self.TILE_SHIFT))
+            allCols.append(cols + (tileCol << self.TILE_SHIFT))
+
+        return np.concatenate(allRows), np.concatenate(allCols)
+
+    def clear(self):
+        """ Removes all tiles """
+        self.tiles = {}
+        self.stickyTiles = {}
@@ -0,0 +1,161 @@
+'''
+Runs the DLA simulation without the GUI, for batch jobs on machines with no display.
+Only NumPy is needed (matplotlib is never imported).
+
+    python headless.py 10000 --seed 1 --output results/run1
+
+grows a cluster of 10000 particles and writes to the output directory:
+- cluster.npz: x and y coordinates of the particles in arrival order, the seeds, the
+  number of particles with radius in range [i, i+1) and the same for the growth sites
+  (the empty sites next to the cluster), the number of occupied boxes of each size and
+  the radius of gyration of the first N particles
+- cluster.dla: the seeds and particles in arrival order and the settings of the run, in
+  the compact format of cluster_file.py (main.py --load opens it in the GUI)
+- summary.json: the settings of the run, the final radius, the number of growth sites,
+  the box-counting and radius of gyration estimates of the dimension, the running time
+  and the counters of the walk engine (see engine_stats.py)
+
+The same can be done from Python with grow() and run().
+'''
+
+import numpy as np
+import argparse
+import json
+import os
+import time
+
+import cluster_file
+
+from estimators import BoxCounting, RadiusOfGyration
+from lattice import Lattice
+
+CALLBACK_SETTINGS = ("observers",) # settings of grow() that are not written into summary.json
+
+def createLattice(seed=Lattice.randomSeed, bias=None, seeds=(), backend="DENSE", walkMode="UNIT", boundaryMode="WRAP",
+                  engine="SEQUENTIAL", batchSize=1024, batchMode="ARRIVAL", stencil="FOUR", mapSize=None, observers=()):
+    """ Returns a lattice with the seeds and settings of a run, ready to grow (see grow() for the parameters) """
+
+    lattice = Lattice(backend=backend, mapSize=mapSize, stencil=stencil)
+    lattice.setRandomSeed(seed)
+
+    if bias is not None:
+        for value, direction in zip(bias, lattice.DIRECTIONS):
+            lattice.setBias(value, direction)
+
+    for x, y in seeds:
+        lattice.set(x, y, True)
+
+    lattice.setWalkMode(walkMode)
+    lattice.setBoundaryMode(boundaryMode)
+    lattice.setEngine(engine, batchSize, batchMode)
+
+    for observer in observers:
+        lattice.addObserver(observer)
+
+    return lattice
+
+def grow(count, seed=Lattice.randomSeed, bias=None, seeds=(), **settings):
+    """ Grows a cluster of count particles.
+
+    Parameters
+        seed: random seed of the run (an int or a np.random.SeedSequence, see Lattice.setRandomSeed)
+        bias: relative bias of each direction of the stencil, in the order of Lattice.DIRECTIONS (None for no bias)
+        seeds: extra (x, y) seed particles, in addition to the one at the centre
+        backend, walkMode, boundaryMode, engine, batchSize, batchMode, stencil, mapSize: see Lattice
+        observers: functions called with (x, y, radius) whenever a particle sticks
+
+    Returns the lattice and the x, y coordinates of the particles in arrival order
+    """
+
+    lattice = createLattice(seed, bias, seeds, **settings)
+    xs, ys = lattice.addMany(count)
+
+    return lattice, np.array(xs, dtype=np.int64), np.array(ys, dtype=np.int64)
+
+def getCountsPerRadius(xs, ys):
+    """ Returns the number of particles with radius in range [i, i+1) (see AnalysisScreen.registerRadius) """
+    return np.bincount(np.sqrt(xs*xs + ys*ys).astype(np.int64))
+
+def getEstimators(xs, ys):
+    """ Returns the box-counting and radius of gyration estimators of the particles (see estimators.py) """
+
+    boxCounting, radiusOfGyration = BoxCounting(), RadiusOfGyration()
+    boxCounting.addSites(xs, ys)
+    radiusOfGyration.addSites(xs, ys)
+
+    return boxCounting, radiusOfGyration
+
+def getSeedSummary(seed):
+    """ Returns the random seed as a JSON-friendly value (the entropy and spawn key of a np.random.SeedSequence) """
+
+    if isinstance(seed, np.random.SeedSequence):
+        return {"entropy": seed.entropy, "spawnKey": list(seed.spawn_key)}
+
+    return seed
+
+def run(count, output, seed=Lattice.randomSeed, bias=None, seeds=(), **settings):
+    """ Grows a cluster with grow() and writes the results into the output directory """
+
+    executionTime = time.time()
+    lattice, xs, ys = grow(count, seed, bias, seeds, **settings)
+    executionTime = time.time() - executionTime
+
+    os.makedirs(output, exist_ok=True)
+
+    boxCounting, radiusOfGyration = getEstimators(xs, ys)
+    boxSizes, boxCounts = boxCounting.getCounts()
+
+    seeds = np.array(seeds, dtype=np.int64).reshape(-1, 2)
+    np.savez_compressed(os.path.join(output, "cluster.npz"), x=xs, y=ys, seeds=seeds, countsPerRadius=getCountsPerRadius(xs, ys),
+                        growthSitesPerRadius=lattice.getGrowthSitesPerRadius(), boxSizes=boxSizes, boxCounts=boxCounts,
+                        radiusOfGyration=radiusOfGyration.getRadii()[1])
+
+    lattice.exportCluster(os.path.join(output, "cluster" + cluster_file.EXTENSION))
+
+    # keep only the settings that describe the run
+    settings = {key: value for key, value in settings.items() if key not in CALLBACK_SETTINGS}
+
+    summary = {
+        "particleCount": lattice.particleCount,
+        "maxRadius": lattice.maxRadius,
+        "perimeterCount": lattice.getPerimeterCount(),
+        "boxCountingDimension": boxCounting.getDimension(),
+        "gyrationDimension": radiusOfGyration.getDimension(),
+        "seed": getSeedSummary(seed),
+        "bias": lattice.bias,
+        "seeds": seeds.tolist(),
+        "settings": settings,
+        "seconds": executionTime,
+        "engineStats": lattice.getStats(),
+    }
+
+    with open(os.path.join(output, "summary.json"), 'w') as file:
+        json.dump(summary, file, indent=4)
+
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Grows a DLA cluster without the GUI")
+    parser.add_argument("count", type=int, help="number of particles to add")
+    parser.add_argument("--seed", type=int, default=Lattice.randomSeed, help="random seed")
+    parser.add_argument("--bias", type=float, nargs="+", help="relative bias of each direction, in the order of the stencil: "
+                        "right, up, left, down (and up-right, up-left, down-left, down-right)")
+    parser.add_argument("--add-seed", type=int, nargs=2, action="append", default=[], metavar=("X", "Y"), help="extra seed particle (can be repeated)")
+    parser.add_argument("--backend", default="DENSE", choices=["DENSE", "BITPACKED", "TILED"])
+    parser.add_argument("--walk", default="UNIT", choices=["UNIT", "JUMP"])
+    parser.add_argument("--boundary", default="WRAP", choices=["WRAP", "RELAUNCH"])
+    parser.add_argument("--engine", default="SEQUENTIAL", choices=["SEQUENTIAL", "BATCH"])
+    parser.add_argument("--batch-size", type=int, default=1024, help="most walkers in flight at once in the BATCH engine")
+    parser.add_argument("--batch-mode", default="ARRIVAL", choices=["ARRIVAL", "MULTI"], help="ARRIVAL: one-by-one DLA, MULTI: multi-particle DLA (a different model)")
+    parser.add_argument("--stencil", default="FOUR", choices=["FOUR", "EIGHT"])
+    parser.add_argument("--output", default="results", help="output directory")
+    args = parser.parse_args()
+
+    summary = run(args.count, args.output, args.seed, args.bias, args.add_seed, backend=args.backend,
+                  walkMode=args.walk, boundaryMode=args.boundary, engine=args.engine,
+                  batchSize=args.batch_size, batchMode=args.batch_mode, stencil=args.stencil)
+
+    print("{0:d} particles, max radius {1:d}, {2:.3f} s".format(summary["particleCount"], summary["maxRadius"], summary["seconds"]))
+
+if __name__ == "__main__":
+    main()
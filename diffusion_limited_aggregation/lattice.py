@@ -1,7 +1,16 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import math
-import random
+import os
+import threading
+import time
+
+import checkpoint
+import cluster_file
+from batch_engine import BatchEngine
+from distance_map import DistanceMap
+from engine_stats import EngineStats
+from grids import DenseGrid, MappedGrid, BitPackedGrid, TiledGrid
+from particle_store import ParticleStore, MappedParticleStore
 
 class Lattice:
     """
@@ -16,44 +25,252 @@ class Lattice:
 
     '''
 
-    MAP_SIZE = 1000
+    MAP_SIZE = 1000 # size of the "DENSE" and "BITPACKED" maps, the "TILED" map has no size limit
     INT_HALF_MAP_SIZE = int(MAP_SIZE / 2)
     EXTRA_RADIUS = 5
 
     particleCount = 0 # the number of particles excluding the seeds
     maxRadius = 1
+    seedRadius = 0 # distance from the origin to the furthest seed, the cluster is inside max(maxRadius + 1, seedRadius)
     
-    bias = [1, 1, 1, 1] # bias used to choose a random direction
-    cumulativeBias = [1, 2, 3, 4] # cumulative bias for each direction: Right, Up, Left, Down
+    # moves of a walker: direction names, row steps and column steps
+    STENCILS = {
+        "FOUR": (["RIGHT", "UP", "LEFT", "DOWN"], [0, -1, 0, 1], [1, 0, -1, 0]),
+        "EIGHT": (["RIGHT", "UP", "LEFT", "DOWN", "UP_RIGHT", "UP_LEFT", "DOWN_LEFT", "DOWN_RIGHT"],
+                  [0, -1, 0, 1, -1, -1, 1, 1], [1, 0, -1, 0, 1, -1, -1, 1]),
+    }
+
+    stencil = "FOUR"
+
+    # direction names, and row and column steps for each direction: Right, Up, Left, Down
+    DIRECTIONS = STENCILS["FOUR"][0]
+    DIRECTION_ROWS = np.array(STENCILS["FOUR"][1])
+    DIRECTION_COLS = np.array(STENCILS["FOUR"][2])
+
+    bias = [1, 1, 1, 1] # bias used to choose a random direction, in the order of DIRECTIONS
+
+    # alias table of the bias: a direction is drawn as a uniform column, kept with
+    # the probability of the column or replaced by its alias otherwise
+    aliasProbabilities = None
+    aliasDirections = None
+
+    # the number of random steps drawn at once
+    STEP_BLOCK_SIZE = 65536
+
+    # long jumps: the walker crosses a circle that is known to be free of particles in one move
+    JUMP_MARGIN = 3 # distance kept from the cluster (rounding to the lattice moves the walker by < 1 site)
+    MIN_JUMP_RADIUS = 4 # shorter jumps are not worth the extra calculation
+    JUMP_CHECK_INTERVAL = 8 # unit steps taken before checking again when a jump was not possible
+
+    walkMode = "UNIT" # "UNIT": unit steps only, "JUMP": long jumps far from the cluster
+    distanceMap = None # only maintained in the "JUMP" mode
+
+    # "WRAP": a walker leaving the square box around the cluster is wrapped back in
+    # "RELAUNCH": a walker leaving the kill circle re-enters on the launch circle, and jumps outside the cluster
+    boundaryMode = "WRAP"
+    KILL_RADIUS_FACTOR = 2 # kill radius relative to the launch radius
 
     randomSeed = 1234
+    seedSequence = None # root of the random streams, a child is spawned for the batch engine
+    randomGenerator = None # np.random.Generator of the sequential walk
+
+    engine = "SEQUENTIAL" # "SEQUENTIAL": one walker at a time, "BATCH": many walkers at once
+    batchEngine = None
+
+    arrivalLog = None # on-disk order of the occupied positions, only for the "MAPPED" map
+
+    LOAD_ROOM_FACTOR = 1.25 # radius of a loaded map relative to the cluster, when MAP_SIZE is too small (see Lattice.load)
+
+    def __init__(self, program=None, plt=None, row=None, col=None, backend="DENSE", mapSize=None, path=None, isResuming=False,
+                 stencil="FOUR"):
+        """ Creates the map and places an initial seed at the centre.
+
+        The lattice does not depend on the GUI (program and plt may be None); other
+        classes follow the new particles through observers, see Lattice.addObserver.
+
+        Parameters
+            backend: "DENSE" (one NumPy array of MAP_SIZE x MAP_SIZE),
+                     "MAPPED" (the "DENSE" array in a memory-mapped file in the directory path),
+                     "BITPACKED" (one bit per site, for very large maps) or
+                     "TILED" (unbounded, tiles allocated on demand)
+            mapSize: overrides MAP_SIZE for the "DENSE", "MAPPED" and "BITPACKED" maps
+            stencil: "FOUR" (moves to the 4 nearest neighbours) or "EIGHT" (diagonal moves too);
+                     a walker sticks when one move could take it onto the cluster
+            isResuming: continues from the last checkpoint in path instead (see Lattice.resume)
+        """
 
-    def __init__(self, program, plt, row, col):
         # save frequently used objects locally
         self.program = program
         self.plt = plt
 
-        # initialising a 2D array in one line (last checked 16 Nov 2021):
-        # https://stackoverflow.com/questions/2397141/how-to-initialize-a-two-dimensional-array-in-python
-        self.map = [[False] * self.MAP_SIZE for i in range(self.MAP_SIZE)]
+        # functions called with (x, y, radius) whenever a particle sticks
+        self.observers = []
+
+        # held while growing and changing the settings, so that the cluster can grow on another thread
+        self.lock = threading.RLock()
+
+        if isResuming:
+            meta = checkpoint.readCheckpoint(path)
+            mapSize = meta["mapSize"]
+            stencil = meta["stencil"]
+
+        if stencil not in self.STENCILS:
+            print("[Error] <Lattice::__init__> Undefined stencil: {}".format(stencil))
+            stencil = "FOUR"
+
+        self.stencil = stencil
+        self.DIRECTIONS = list(self.STENCILS[stencil][0])
+        self.DIRECTION_ROWS = np.array(self.STENCILS[stencil][1])
+        self.DIRECTION_COLS = np.array(self.STENCILS[stencil][2])
+
+        # own copy, so that lattices do not share the bias through the class
+        self.bias = [1] * len(self.DIRECTIONS)
+        self._buildAliasTable()
+
+        # the sticky neighbourhood of the grids is the stencil
+        offsets = list(zip(self.DIRECTION_ROWS.tolist(), self.DIRECTION_COLS.tolist()))
+
+        if mapSize is not None:
+            self.MAP_SIZE = mapSize
+            self.INT_HALF_MAP_SIZE = int(mapSize / 2)
+
+        # occupancy grid, see grids.py
+        if backend == "TILED":
+            self.map = TiledGrid(offsets)
+        elif backend == "BITPACKED":
+            self.map = BitPackedGrid(self.MAP_SIZE, offsets)
+        elif backend == "MAPPED":
+            self.map = MappedGrid(self.MAP_SIZE, os.path.join(path, checkpoint.GRID_FILE), isNew=not isResuming, offsets=offsets,
+                                  stickyPath=os.path.join(path, checkpoint.STICKY_FILE))
+            self.arrivalLog = checkpoint.ArrivalLog(os.path.join(path, checkpoint.LOG_FILE), isNew=not isResuming)
+        else:
+            self.map = DenseGrid(self.MAP_SIZE, offsets)
 
-        # set random seed, 1234 for testing
-        np.random.seed(self.randomSeed)
+        self.backend = backend
+        self.path = path
+
+        # every occupied position in arrival order (read from the arrival log for the "MAPPED" map), see particle_store.py
+        self.particles = ParticleStore() if self.arrivalLog is None else MappedParticleStore(self.arrivalLog, self.INT_HALF_MAP_SIZE)
+
+        # counters of the walk engines, see engine_stats.py
+        self.stats = EngineStats()
+
+        # set random seed, 1234 for testing (also discards the pre-generated random steps)
+        self.setRandomSeed(self.randomSeed)
+
+        if isResuming:
+            self._restore(meta)
+            return
 
         # set an initial seed at the centre
         self.set(0, 0, True)
 
-    def _isInBoundary(self, row, col):
-        """ Returns True iff a given position is in the map (not out of boundary). """
-        return (0 <= row < self.MAP_SIZE) and (0 <= col < self.MAP_SIZE)
+    @classmethod
+    def resume(cls, program=None, plt=None, path=None):
+        """ Returns a "MAPPED" lattice continuing from the last checkpoint saved in path """
+        return cls(program, plt, 0, 0, backend="MAPPED", path=path, isResuming=True)
+
+    def _discardStepBlock(self):
+        """ Throws away the remaining pre-generated steps so that the next walk draws a new block """
+        self.stepRows, self.stepCols = [], []
+        self.stepIndex = 0
+
+        self.angles = []
+        self.angleIndex = 0
+
+        # generator states before the blocks were drawn, to re-draw them when resuming
+        self.stepBlockState, self.angleBlockState = None, None
+
+    def _generateStepBlock(self):
+        """ Draws a block of random directions and converts them into row and column steps """
+
+        self.stepBlockState = self.randomGenerator.bit_generator.state
+
+        # python lists are faster to index one by one
+        stepRows, stepCols = self._drawSteps(self.STEP_BLOCK_SIZE, self.randomGenerator)
+
+        self.stepRows = stepRows.tolist()
+        self.stepCols = stepCols.tolist()
+        self.stepIndex = 0
+
+    def _drawSteps(self, count, randomGenerator):
+        """ Returns arrays of row and column steps in random directions, with bias, drawn from a given generator """
+
+        # one uniform number per step: the integer part picks a column of the alias
+        # table and the fractional part decides between the column and its alias
+        draws = randomGenerator.uniform(0, len(self.bias), count)
+        columns = np.minimum(draws.astype(np.int64), len(self.bias) - 1)
+
+        directions = np.where(draws - columns < self.aliasProbabilities[columns], columns, self.aliasDirections[columns])
+
+        return self.DIRECTION_ROWS[directions], self.DIRECTION_COLS[directions]
+
+    def _buildAliasTable(self):
+        """ Builds the alias table of the bias (Vose's method), so that drawing a direction costs the same with any bias """
+
+        weights = np.array(self.bias, dtype=np.float64)
+
+        # no direction can be drawn without any weight, walk without bias instead
+        if weights.sum() <= 0:
+            weights = np.ones(len(weights))
+
+        # scaled so that the average column holds probability 1
+        scaled = weights * len(weights) / weights.sum()
+
+        self.aliasProbabilities = np.ones(len(weights))
+        self.aliasDirections = np.arange(len(weights))
+
+        smalls = [i for i in range(len(weights)) if scaled[i] < 1]
+        larges = [i for i in range(len(weights)) if scaled[i] >= 1]
+
+        # fill each small column up to 1 with a large one
+        while smalls and larges:
+            small, large = smalls.pop(), larges.pop()
+
+            self.aliasProbabilities[small] = scaled[small]
+            self.aliasDirections[small] = large
+
+            scaled[large] -= 1 - scaled[small]
+            (smalls if scaled[large] < 1 else larges).append(large)
+
+        # the columns left over are full up to rounding errors
+        for i in smalls + larges:
+            self.aliasProbabilities[i] = 1
+
+    def _generateAngleBlock(self):
+        """ Draws a block of uniformly random angles in [0, 2 pi) """
 
-    def _hasNeighbour(self, row, col):
-        """ Returns True iff there is at least one adjacent particle around. """
+        self.angleBlockState = self.randomGenerator.bit_generator.state
 
-        return self.get(row+1, col) or \
-                self.get(row-1, col) or \
-                self.get(row, col+1) or \
-                self.get(row, col-1)
+        self.angles = self.randomGenerator.uniform(0, 2*np.pi, self.STEP_BLOCK_SIZE >> 4).tolist()
+        self.angleIndex = 0
+
+    def _nextAngle(self):
+        """ Returns a uniformly random angle in [0, 2 pi), drawn in blocks like the steps """
+
+        if self.angleIndex == len(self.angles):
+            self._generateAngleBlock()
+
+        self.angleIndex += 1
+        return self.angles[self.angleIndex - 1]
+
+    def _reenter(self, x, y, launchRadius):
+        """ Moves a walker outside the launch circle to where it would first hit the circle.
+
+        For a walk without bias the first hitting point follows the harmonic measure
+        seen from (x, y), which is a wrapped Cauchy distribution around the walker's
+        angle with concentration launchRadius / r. Returns the new (row, col).
+        A biased walk drifts instead, so it is wrapped in the box (see Lattice.add).
+        """
+
+        ratio = launchRadius / math.sqrt(x*x + y*y)
+        angle = math.atan2(y, x) + 2 * math.atan((1 - ratio) / (1 + ratio) * math.tan(self._nextAngle() / 2 - math.pi / 2))
+
+        return self._getRowColfromXY(round(launchRadius * math.cos(angle)), round(launchRadius * math.sin(angle)))
+
+    def _isIsotropic(self):
+        """ Returns True iff all directions have the same bias (a jump or a re-entry is only exact without bias) """
+        return self.bias.count(self.bias[0]) == len(self.bias)
 
     def _getRowColfromXY(self, x, y):
         return int(y + self.INT_HALF_MAP_SIZE), int(x + self.INT_HALF_MAP_SIZE)
@@ -64,7 +281,7 @@ class Lattice:
 
     def get(self, row, col):
         """ Returns the boolean value at a given position if it is in the boundary """
-        return self.map[row][col] if self._isInBoundary(row, col) else False
+        return self.map.get(row, col)
 
 
     def set(self, x, y, value):
@@ -74,66 +291,519 @@ class Lattice:
             value: True or False
         """
 
-        row, col = self._getRowColfromXY(x, y)
+        with self.lock:
+            row, col = self._getRowColfromXY(x, y)
 
-        if self._isInBoundary(row, col):
-            self.map[row][col] = value
-        else:
-            print("[Error] <Lattice::set> Out of boundary: {}, {}".format(row, col))
+            if self.map.isInBoundary(row, col):
+                if value:
+                    self.particles.append(int(x), int(y), checkpoint.SEED)
+                    self.seedRadius = max(self.seedRadius, math.sqrt(x*x + y*y))
+
+                self.map.set(row, col, value)
+
+                if value and self.distanceMap is not None:
+                    self.distanceMap.markSite(int(x), int(y))
+            else:
+                print("[Error] <Lattice::set> Out of boundary: {}, {}".format(row, col))
 
     def setBias(self, value, direction):
-        """ Sets bias of a direction and re-calculates the cumulative distribution """
+        """ Sets bias of a direction (one of DIRECTIONS) and rebuilds the alias table """
+
+        with self.lock:
+            # update the bias array
+            if direction in self.DIRECTIONS:
+                self.bias[self.DIRECTIONS.index(direction)] = value
+            else:
+                print("[Error] <Lattice:setBias> Undefined Condition")
+                return
 
-        # update the bias array
-        if direction == "RIGHT": self.bias[0] = value
-        elif direction == "UP": self.bias[1] = value
-        elif direction == "LEFT": self.bias[2] = value
-        elif direction == "DOWN": self.bias[3] = value
-        else: print("[Error] <Lattice:setBias> Undefined Condition")
+            self._buildAliasTable()
 
-        # update the cumulative bias (Right -> Up -> Left -> Down)
-        self.cumulativeBias = [sum(self.bias[j] for j in range(i+1)) for i in range(0, 4)]
+            # steps drawn with the old bias are no longer valid
+            self._discardStepBlock()
 
     def setRandomSeed(self, seed):
-        self.randomSeed = seed
-        np.random.seed(self.randomSeed)
+        """ Restarts the random streams from a seed (an int, or a np.random.SeedSequence spawned elsewhere) """
+
+        with self.lock:
+            self.seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+            self.randomSeed = self.seedSequence.entropy
+            self.randomGenerator = np.random.default_rng(self.seedSequence)
+
+            self._discardStepBlock()
+
+            # the batch engine draws from its own child stream
+            if self.batchEngine is not None:
+                self.batchEngine.resetRandomGenerator()
 
     def getRandomSeed(self):
         return self.randomSeed
 
+    def getRandomState(self):
+        """ Returns the state of all random streams as JSON-friendly values (see Lattice.setRandomState) """
+
+        return {
+            "entropy": self.seedSequence.entropy,
+            "spawnKey": list(self.seedSequence.spawn_key),
+            "childrenSpawned": self.seedSequence.n_children_spawned,
+            "generator": self.randomGenerator.bit_generator.state,
+            "stepBlock": self.stepBlockState,
+            "stepIndex": self.stepIndex,
+            "angleBlock": self.angleBlockState,
+            "angleIndex": self.angleIndex,
+            "batch": None if self.batchEngine is None else self.batchEngine.randomGenerator.bit_generator.state,
+        }
+
+    def setRandomState(self, state):
+        """ Restores the random streams saved by Lattice.getRandomState, so that the run continues exactly """
+
+        self.seedSequence = np.random.SeedSequence(state["entropy"], spawn_key=tuple(state["spawnKey"]),
+                                                   n_children_spawned=state["childrenSpawned"])
+        self.randomSeed = self.seedSequence.entropy
+        self.randomGenerator = np.random.default_rng(self.seedSequence)
+
+        self._discardStepBlock()
+
+        # re-draw the blocks in use, then continue from the saved state
+        if state["stepBlock"] is not None:
+            self.randomGenerator.bit_generator.state = state["stepBlock"]
+            self._generateStepBlock()
+            self.stepIndex = state["stepIndex"]
+
+        if state["angleBlock"] is not None:
+            self.randomGenerator.bit_generator.state = state["angleBlock"]
+            self._generateAngleBlock()
+            self.angleIndex = state["angleIndex"]
+
+        self.randomGenerator.bit_generator.state = state["generator"]
+
+        if self.batchEngine is not None:
+            if state["batch"] is None:
+                self.batchEngine.resetRandomGenerator()
+            else:
+                self.batchEngine.randomGenerator.bit_generator.state = state["batch"]
+
+    def setWalkMode(self, mode):
+        """ Sets the walk mode and builds the distance map from the current particles if needed
+
+        Parameters
+            mode: "UNIT" (one site per step) or "JUMP" (long jumps far from the cluster)
+        """
+
+        with self.lock:
+            if mode == "UNIT":
+                self.distanceMap = None
+            elif mode == "JUMP":
+                if self.distanceMap is None:
+                    self.distanceMap = DistanceMap()
+
+                    rows, cols = self.map.getOccupied()
+                    self.distanceMap.markSites(*self._getXYfromRowCol(rows.astype(np.int64), cols.astype(np.int64)))
+            else:
+                print("[Error] <Lattice:setWalkMode> Undefined Condition")
+                return
+
+            self.walkMode = mode
+
     def reset(self):
         """ Resets the map and fills with False. """
-        self.map = [[False] * self.MAP_SIZE for i in range(self.MAP_SIZE)]
+        with self.lock:
+            self.map.clear()
+            self.particles.truncate(0)
+            self.stats.reset()
+            self.seedRadius = 0
+
+            if self.distanceMap is not None:
+                self.distanceMap = DistanceMap()
+
+    def truncate(self, count):
+        """ Rolls the cluster back to its first count arrivals (seeds included), without replaying the walk
+
+        Only the removed and the remaining positions are visited. The random streams
+        carry on from where they are, so growing again gives a different cluster.
+        A "MAPPED" lattice is checkpointed afterwards, as the removed entries of the
+        arrival log are overwritten by the next arrivals.
+        """
+
+        with self.lock:
+            # remove the positions that arrived later
+            xs, ys, kinds = self.particles.getEntries(count)
+
+            for row, col in zip((ys + self.INT_HALF_MAP_SIZE).tolist(), (xs + self.INT_HALF_MAP_SIZE).tolist()):
+                self.map.set(row, col, False)
+
+            self.particles.truncate(count)
+
+            # recalculate the counters from the remaining positions (the radius only counts the particles, as in Lattice.add)
+            xs, ys, kinds = self.particles.getEntries()
+            isParticle = kinds == checkpoint.PARTICLE
+
+            self.particleCount = int(np.count_nonzero(isParticle))
+            self.maxRadius = max(1, int(np.sqrt(xs[isParticle]**2 + ys[isParticle]**2).max(initial=0)))
+            self.seedRadius = float(np.sqrt(xs[~isParticle]**2 + ys[~isParticle]**2).max(initial=0))
+
+            if self.distanceMap is not None:
+                self.distanceMap = DistanceMap()
+                self.distanceMap.markSites(xs, ys)
+
+            if self.arrivalLog is not None:
+                self.checkpoint()
+
+    def setBoundaryMode(self, mode):
+        """ Sets what happens to a walker that wanders too far from the cluster
+
+        Parameters
+            mode: "WRAP" (wrapped back into a square box) or
+                  "RELAUNCH" (re-enters on the launch circle once outside the kill circle,
+                  only without bias, a biased walk is wrapped instead)
+
+        With "RELAUNCH", a walker outside the circle of the cluster also takes long jumps
+        (as in the "JUMP" walk, the cluster is at least its distance to that circle away),
+        so that it reaches the kill circle or comes back quickly even in the "UNIT" walk.
+        Without them, walkers wander between the launch and kill circles for longer than
+        they would in the box, and "RELAUNCH" is slower than "WRAP".
+        """
+
+        with self.lock:
+            if mode == "RELAUNCH" and not self._isIsotropic():
+                print("[Error] <Lattice:setBoundaryMode> RELAUNCH needs a walk without bias, WRAP is used instead")
+                self.boundaryMode = "WRAP"
+            elif mode in ("WRAP", "RELAUNCH"):
+                self.boundaryMode = mode
+            else:
+                print("[Error] <Lattice:setBoundaryMode> Undefined Condition")
+
+    def checkpoint(self):
+        """ Saves the state of a "MAPPED" lattice so that it can be resumed with Lattice.resume.
+
+        The map and the arrival log are flushed first, then the metadata is replaced
+        atomically, so a crash at any point leaves a complete checkpoint behind.
+        """
+
+        if self.arrivalLog is None:
+            print("[Error] <Lattice::checkpoint> Only the MAPPED map can be checkpointed")
+            return
+
+        self.map.flush()
+        self.arrivalLog.flush()
+
+        checkpoint.writeCheckpoint(self.path, {
+            "mapSize": self.MAP_SIZE,
+            "arrivalCount": len(self.arrivalLog),
+            **self._getSettings(),
+        })
+
+    def _getSettings(self):
+        """ Returns the counters and the settings of the run (JSON-friendly), restored by Lattice._restoreSettings """
+
+        return {
+            "stencil": self.stencil,
+            "particleCount": self.particleCount,
+            "maxRadius": self.maxRadius,
+            "bias": self.bias,
+            "randomSeed": self.randomSeed,
+            "walkMode": self.walkMode,
+            "boundaryMode": self.boundaryMode,
+            "engine": self.engine,
+            "batchSize": None if self.batchEngine is None else self.batchEngine.batchSize,
+            "batchMode": None if self.batchEngine is None else self.batchEngine.mode,
+            "randomState": self.getRandomState(),
+        }
+
+    def _restore(self, meta):
+        """ Restores the state saved by Lattice.checkpoint """
+
+        # remove the positions set after the checkpoint
+        rows, cols, kinds = self.arrivalLog.getEntries(meta["arrivalCount"])
+
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            self.map.set(row, col, False)
+
+        self.arrivalLog.truncate(meta["arrivalCount"])
+
+        # set the saved positions again, in case the run stopped while Lattice.truncate was clearing them
+        rows, cols, kinds = self.arrivalLog.getEntries()
+        self.map.setMany(rows.astype(np.int64), cols.astype(np.int64))
+
+        xs, ys = self._getXYfromRowCol(rows[kinds == checkpoint.SEED].astype(np.int64), cols[kinds == checkpoint.SEED].astype(np.int64))
+        self.seedRadius = float(np.sqrt(xs*xs + ys*ys).max(initial=0))
+
+        self._restoreSettings(meta)
+
+    def _restoreSettings(self, meta):
+        """ Restores the counters and the settings saved by Lattice._getSettings """
+
+        self.particleCount = meta["particleCount"]
+        self.maxRadius = meta["maxRadius"]
+        self.boundaryMode = meta["boundaryMode"]
+
+        self.bias = meta["bias"]
+        self._buildAliasTable()
+
+        self.setWalkMode(meta["walkMode"])
+
+        if meta["engine"] == "BATCH":
+            self.setEngine("BATCH", meta["batchSize"], meta["batchMode"])
+
+        self.setRandomState(meta["randomState"])
+
+    def exportCluster(self, path):
+        """ Writes the occupied positions in arrival order and the settings of the run into a compact file,
+        which Lattice.load reads back (see cluster_file.py)
+        """
+
+        with self.lock:
+            xs, ys, kinds = self.particles.getEntries()
+            isSeed = kinds == checkpoint.SEED
+
+            cluster_file.writeClusterFile(path, xs, ys, kinds, {
+                "backend": self.backend,
+                "mapSize": self.MAP_SIZE,
+                "arrivalCount": len(xs),
+                "seeds": np.column_stack((xs[isSeed], ys[isSeed])).tolist(),
+                **self._getSettings(),
+            })
+
+    @classmethod
+    def load(cls, program=None, plt=None, path=None, backend="DENSE"):
+        """ Returns a lattice holding the cluster of a file written by Lattice.exportCluster, ready to grow further
+
+        The positions are read and occupied one chunk at a time, and the random streams
+        continue from where the exported run stopped. The "DENSE" and "BITPACKED" maps
+        are made large enough for the cluster if MAP_SIZE is too small.
+        """
+
+        meta = cluster_file.readClusterMeta(path)
+
+        # room for the seeds, and for the cluster to grow further
+        extent = max([int(cls.LOAD_ROOM_FACTOR * (meta["maxRadius"] + cls.EXTRA_RADIUS))] + [max(abs(x), abs(y)) for x, y in meta["seeds"]])
+        mapSize = max(meta["mapSize"], 2 * (extent + 1))
+
+        lattice = cls(program, plt, 0, 0, backend=backend, mapSize=mapSize, stencil=meta["stencil"])
+
+        # the file starts from an empty lattice
+        lattice.truncate(0)
+
+        for xs, ys, kinds in cluster_file.iterClusterChunks(path):
+            lattice.addArrivals(xs, ys, kinds)
+
+        # the distance map of the "JUMP" walk from the positions at once, faster than from the whole map
+        if meta["walkMode"] == "JUMP":
+            xs, ys, kinds = lattice.getArrivals()
+            lattice.distanceMap = DistanceMap()
+            lattice.distanceMap.markSites(xs, ys)
+
+        lattice._restoreSettings(meta)
+
+        return lattice
+
+    def addArrivals(self, xs, ys, kinds):
+        """ Occupies arrays of positions in arrival order without walking (x, y coordinates and kinds, checkpoint.SEED or PARTICLE)
+
+        The observers are not called, see Lattice.getArrivals to follow the positions.
+        """
+
+        with self.lock:
+            xs, ys, kinds = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64), np.asarray(kinds)
+
+            if len(xs) == 0:
+                return
+
+            if max(int(np.abs(xs).max()), int(np.abs(ys).max())) > self.map.getRadiusLimit(self.INT_HALF_MAP_SIZE):
+                print("[Error] <Lattice::addArrivals> Out of boundary")
+                return
+
+            rows, cols = ys + self.INT_HALF_MAP_SIZE, xs + self.INT_HALF_MAP_SIZE
+
+            # logged before they are set, as in Lattice._register
+            self.particles.extend(xs, ys, kinds)
+            self.map.setMany(rows, cols)
+
+            # the radius only counts the particles, as in Lattice.add
+            isParticle = kinds == checkpoint.PARTICLE
+
+            self.particleCount += int(np.count_nonzero(isParticle))
+            self.maxRadius = max(self.maxRadius, int(np.sqrt(xs[isParticle]**2 + ys[isParticle]**2).max(initial=0)))
+            self.seedRadius = max(self.seedRadius, float(np.sqrt(xs[~isParticle]**2 + ys[~isParticle]**2).max(initial=0)))
+
+            if self.distanceMap is not None:
+                self.distanceMap.markSites(xs, ys)
+
+    def getArrivals(self, start=0, end=None):
+        """ Returns the x, y coordinates and kinds (checkpoint.SEED or PARTICLE) of the occupied positions
+        in arrival order, in range [start, end) of the arrival index (see ParticleStore.getEntries)
+        """
+        return self.particles.getEntries(start, end)
+
+    def getGrowthSites(self):
+        """ Returns the x, y coordinates of the perimeter sites (the empty sites next to the cluster, where a walker sticks) """
+
+        rows, cols = self.map.getPerimeter()
+        return self._getXYfromRowCol(rows.astype(np.int64), cols.astype(np.int64))
+
+    def getPerimeterCount(self):
+        """ Returns the number of perimeter sites """
+        return len(self.map.getPerimeter()[0])
+
+    def getGrowthSitesPerRadius(self):
+        """ Returns the number of perimeter sites with radius in range [i, i+1) """
+
+        x, y = self.getGrowthSites()
+        return np.bincount(np.sqrt(x*x + y*y).astype(np.int64))
+
+    def getStats(self):
+        """ Returns the counters of the walk engines: moves per particle, wraps, re-entries and time split (see EngineStats.getSummary) """
+        return self.stats.getSummary()
+
+    def addObserver(self, observer):
+        """ Registers a function to be called with (x, y, radius) whenever a particle sticks """
+        self.observers.append(observer)
+
+    def removeObserver(self, observer):
+        self.observers.remove(observer)
+
+    def setEngine(self, engine, batchSize=1024, batchMode="ARRIVAL"):
+        """ Sets how Lattice.addMany grows the cluster
+
+        Parameters
+            engine: "SEQUENTIAL" (Lattice.add one particle at a time) or
+                    "BATCH" (many walkers at once, see batch_engine.py)
+            batchSize: the most walkers in flight at once in the "BATCH" engine
+            batchMode: "ARRIVAL" (one-by-one DLA, the walkers in flight grow with the cluster) or
+                       "MULTI" (multi-particle DLA, a different model), see batch_engine.py
+        """
+
+        with self.lock:
+            if engine == "SEQUENTIAL":
+                self.batchEngine = None
+            elif engine == "BATCH":
+                self.batchEngine = BatchEngine(self, batchSize, batchMode)
+            else:
+                print("[Error] <Lattice:setEngine> Undefined Condition")
+                return
+
+            self.engine = engine
+
+    def addMany(self, count):
+        """ Adds count particles and returns their x and y coordinates as lists """
+
+        with self.lock:
+            engineTime = time.perf_counter()
+
+            if self.batchEngine is not None:
+                xs, ys = self.batchEngine.add(count)
+            else:
+                xs, ys = [], []
+
+                for _ in range(count):
+                    x, y = self.add()
+
+                    # stop if the map is full
+                    if x is None:
+                        break
+
+                    xs.append(x)
+                    ys.append(y)
+
+            self.stats.engineTime += time.perf_counter() - engineTime
+
+            return xs, ys
 
     def add(self):
         """ Adds a new particle on the map by choosing a random direction, with bias. """
 
         # choose a random location on a circle to place the particle
         r = self.maxRadius + self.EXTRA_RADIUS
-        theta = np.random.uniform(0, 2*np.pi)
-
-        newRow = int(self.INT_HALF_MAP_SIZE + r*np.cos(theta))
-        newCol = int(self.INT_HALF_MAP_SIZE + r*np.sin(theta))
 
         # pre-calculate frequently used constants to boost up the speed
-        BOUNDARY_OFFSET = self.INT_HALF_MAP_SIZE - r
+        CENTRE = self.INT_HALF_MAP_SIZE
+        BOUNDARY_OFFSET = CENTRE - r
         TWO_TIMES_R = r << 1
-        MAX_BOUNDARY, MIN_BOUNDARY = self.INT_HALF_MAP_SIZE + r, self.INT_HALF_MAP_SIZE - r
+        MAX_BOUNDARY, MIN_BOUNDARY = CENTRE + r, CENTRE - r
 
-        # randomly translate the particle until it touches another particle
-        while not self._hasNeighbour(newRow, newCol):
-            # choose a random direction
-            direction = np.random.uniform(0, self.cumulativeBias[-1])
+        # the walker must stay inside the map for the neighbour checks to be valid
+        radiusLimit = self.map.getRadiusLimit(CENTRE)
+
+        # the re-entry point is only exact without bias, a biased walk is wrapped (the bias may be set after the mode)
+        isRelaunching = self.boundaryMode == "RELAUNCH" and self._isIsotropic()
+        killRadius = min(self.KILL_RADIUS_FACTOR * r, radiusLimit - 1)
+        KILL_RADIUS_SQUARED = killRadius * killRadius
 
-            # translate to the direction
-            if direction < self.cumulativeBias[0]: newCol += 1
-            elif direction < self.cumulativeBias[1]: newRow -= 1
-            elif direction < self.cumulativeBias[2]: newCol -= 1
-            else: newRow += 1
+        if (killRadius <= r) if isRelaunching else (r > radiusLimit):
+            print("[Error] <Lattice::add> Out of boundary")
+            return None, None
+
+        theta = self.randomGenerator.uniform(0, 2*np.pi)
+
+        newRow = int(CENTRE + r*np.cos(theta))
+        newCol = int(CENTRE + r*np.sin(theta))
+
+        # pre-generated steps, saved locally to avoid attribute look-ups in the loop
+        stepRows, stepCols, stepIndex = self.stepRows, self.stepCols, self.stepIndex
+
+        # long jumps are only taken without bias, where the exit point of a free circle is uniform; a relaunching
+        # walker (never biased) also jumps outside the circle of the cluster when there is no distance map
+        isJumping = isRelaunching or (self.distanceMap is not None and self._isIsotropic())
+        distanceMap = self.distanceMap if isJumping else None
+        clusterRadius = max(self.maxRadius + 1, self.seedRadius) + self.JUMP_MARGIN
+        stepsToCheck = 0
+
+        # counters for the engine statistics (the unit steps are counted from the step index)
+        unitSteps, jumps, wraps, reentries = -stepIndex, 0, 0, 0
+
+        hasNeighbour = self.map.hasNeighbour
+
+        # randomly translate the particle until it touches another particle
+        while not hasNeighbour(newRow, newCol):
+            jumpRadius = 0
+
+            if isJumping:
+                if stepsToCheck == 0:
+                    # the largest circle that is free of particles (and inside the box when wrapping)
+                    if distanceMap is not None:
+                        jumpRadius = distanceMap.distance(newCol - CENTRE, newRow - CENTRE) - self.JUMP_MARGIN
+                    else:
+                        y, x = newRow - CENTRE, newCol - CENTRE
+                        jumpRadius = math.sqrt(x*x + y*y) - clusterRadius
+
+                    if not isRelaunching:
+                        jumpRadius = min(jumpRadius, min(newRow - MIN_BOUNDARY, MAX_BOUNDARY - newRow, newCol - MIN_BOUNDARY, MAX_BOUNDARY - newCol) - 1)
+
+                    if jumpRadius < self.MIN_JUMP_RADIUS:
+                        stepsToCheck = self.JUMP_CHECK_INTERVAL
+                else:
+                    stepsToCheck -= 1
+
+            if jumpRadius >= self.MIN_JUMP_RADIUS:
+                # jump to a uniformly random point on the circle
+                angle = self._nextAngle()
+
+                newRow += int(round(jumpRadius * math.sin(angle)))
+                newCol += int(round(jumpRadius * math.cos(angle)))
+                jumps += 1
+            else:
+                # draw a new block of random steps if the current one is used up
+                if stepIndex == len(stepRows):
+                    unitSteps += stepIndex
+                    self._generateStepBlock()
+                    stepRows, stepCols, stepIndex = self.stepRows, self.stepCols, 0
+
+                # translate to the next random direction
+                newRow += stepRows[stepIndex]
+                newCol += stepCols[stepIndex]
+                stepIndex += 1
+
+            if isRelaunching:
+                # re-enter on the launch circle if the particle is outside the kill circle
+                y, x = newRow - CENTRE, newCol - CENTRE
+
+                if x*x + y*y > KILL_RADIUS_SQUARED:
+                    newRow, newCol = self._reenter(x, y, r)
+                    reentries += 1
 
             # check if the particle is outside the boundary
             # (the boundary changes dynamically for better performance)
-            if not (MIN_BOUNDARY < newRow < MAX_BOUNDARY) or not (MIN_BOUNDARY < newCol < MAX_BOUNDARY):
+            elif not (MIN_BOUNDARY < newRow < MAX_BOUNDARY) or not (MIN_BOUNDARY < newCol < MAX_BOUNDARY):
                 # translate to (x, y) coordinate (centred around (0, 0))
                 newRow = newRow - BOUNDARY_OFFSET
                 newCol = newCol - BOUNDARY_OFFSET
@@ -145,28 +815,49 @@ class Lattice:
                 # back to (row, col) coordinate
                 newRow = newRow + BOUNDARY_OFFSET
                 newCol = newCol + BOUNDARY_OFFSET
+                wraps += 1
+
+        self.stepIndex = stepIndex
 
         # new allowed position found, register the particle
-        if self._isInBoundary(newRow, newCol):
-            self.map[newRow][newCol] = True
-            self.particleCount += 1
+        if self.map.isInBoundary(newRow, newCol):
+            stats = self.stats
+            stats.recordParticle(unitSteps + stepIndex + jumps)
+            stats.jumpCount += jumps
+            stats.wrapCount += wraps
+            stats.reentryCount += reentries
 
-            self.program.controlPanel.infoAnalysis.updateCount(self.particleCount)
+            return self._register(newRow, newCol)
 
-            # update max radius for next function call
-            x, y = self._getXYfromRowCol(newRow, newCol)
+        else:
+            print("[Error] <Lattice::add> Out of boundary")
+            return None, None
 
-            newRadius = int(math.sqrt(x*x + y*y))
-            self.program.analysisScreen.registerRadius(newRadius)
+    def _register(self, row, col):
+        """ Registers a particle that has stuck at a given position and returns its x, y coordinates """
 
-            if newRadius > self.maxRadius:
-                self.maxRadius = newRadius
+        bookkeepingTime = time.perf_counter()
 
-            # return the new coordinate for external uses
-            return x, y
+        # log the position before setting it, so that a crash in between can be rolled back (see Lattice._restore)
+        x, y = self._getXYfromRowCol(row, col)
+        self.particles.append(x, y, checkpoint.PARTICLE)
 
-        else:
-            print("[Error] <Lattice::add> Out of boundary")
-            return None, None
+        self.map.set(row, col, True)
+        self.particleCount += 1
+
+        if self.distanceMap is not None:
+            self.distanceMap.markSite(x, y)
+
+        # update max radius for next function call
+        newRadius = int(math.sqrt(x*x + y*y))
+
+        if newRadius > self.maxRadius:
+            self.maxRadius = newRadius
+
+        for observer in self.observers:
+            observer(x, y, newRadius)
 
+        self.stats.bookkeepingTime += time.perf_counter() - bookkeepingTime
 
+        # return the new coordinate for external uses
+        return x, y
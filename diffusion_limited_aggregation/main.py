@@ -1,11 +1,16 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import random
+import argparse
+import os
+
+import checkpoint
 
 from lattice import Lattice
 from plot_screen import PlotScreen
 from control_panel import ControlPanel
 from analysis_screen import AnalysisScreen
+from particle_events import ParticleEvents
 
 class DLASimulator:
     """
@@ -15,10 +20,21 @@ class DLASimulator:
 
     UID = None
 
-    def __init__(self):
+    def __init__(self, checkpointPath=None, isResuming=False, clusterPath=None, backend="DENSE", mapSize=None):
         # get a unique id for this run
         self.UID = random.randint(0, 10000)
 
+        # directory of the memory-mapped lattice (None to keep everything in memory)
+        self.checkpointPath = checkpointPath
+        self.isResuming = isResuming
+
+        # cluster file to start from (see Lattice.exportCluster)
+        self.clusterPath = clusterPath
+
+        # map of a new or loaded lattice (see Lattice), the checkpointed map is always "MAPPED"
+        self.backend = backend
+        self.mapSize = mapSize
+
         # initialise figure and set screen size & ratio
         self.fig = plt.figure(figsize=(0.7*16, 0.7*9))
         self.fig.canvas.manager.set_window_title("Simulator")
@@ -29,13 +45,74 @@ class DLASimulator:
         plt.show()
 
     def initialise(self):
-        self.lattice = Lattice(self, plt, 11, 11)
+        if self.isResuming:
+            self.lattice = Lattice.resume(self, plt, self.checkpointPath)
+        elif self.clusterPath is not None:
+            self.lattice = Lattice.load(self, plt, self.clusterPath, self.backend)
+        elif self.checkpointPath is not None:
+            os.makedirs(self.checkpointPath, exist_ok=True)
+            self.lattice = Lattice(self, plt, 11, 11, backend="MAPPED", mapSize=self.mapSize, path=self.checkpointPath)
+        else:
+            self.lattice = Lattice(self, plt, 11, 11, backend=self.backend, mapSize=self.mapSize)
+
         self.plotScreen = PlotScreen(self, plt)
         self.analysisScreen = AnalysisScreen(self, plt)
+        self.particleEvents = ParticleEvents(self, plt)
         self.controlPanel = ControlPanel(self, plt)
 
+        # follow the new particles in the plot, the analysis screen and the information panel, once per frame
+        self.lattice.addObserver(self.particleEvents.particleAddedCallback)
+
+        self.particleEvents.addListener(self.plotScreen.addParticles)
+        self.particleEvents.addListener(self.analysisScreen.registerParticles)
+        self.particleEvents.addListener(self.particlesAddedCallback)
+
+        if self.isResuming or self.clusterPath is not None:
+            self.replayArrivals()
+
+    def particlesAddedCallback(self, xs, ys):
+        """ Updates the information panel and the axis limits for a batch of new particles """
+        self.controlPanel.infoAnalysis.updateCount(self.lattice.particleCount)
+        self.controlPanel.infoAnalysis.updateStats(self.lattice.getStats())
+        self.plotScreen.updateAxisLimits()
+
+    def replayArrivals(self):
+        """ Plots and registers the particles of a resumed or loaded lattice """
+
+        # the first seed at the centre is already plotted by the plot screen
+        xs, ys, kinds = self.lattice.getArrivals(1)
+        isSeed = kinds == checkpoint.SEED
+
+        # large clusters are too slow to draw with markers
+        if len(xs) > self.plotScreen.MAX_MARKER_COUNT and self.plotScreen.viewMode == "MARKER":
+            self.controlPanel.colourPaletteControl.setViewMode("RASTER")
+
+        self.plotScreen.addSeeds(xs[isSeed], ys[isSeed])
+        self.plotScreen.addParticles(xs[~isSeed], ys[~isSeed])
+
+        self.analysisScreen.registerParticles(xs[~isSeed], ys[~isSeed])
+
+        self.controlPanel.infoAnalysis.updateCount(self.lattice.particleCount)
+        self.plotScreen.updateAxisLimits()
+
+        # fit and dimensions of the whole cluster, as after a run
+        self.analysisScreen.updatePlot()
+
 def main():
-    program = DLASimulator()
+    parser = argparse.ArgumentParser(description="Diffusion limited aggregation simulator")
+    parser.add_argument("--checkpoint", metavar="DIR", help="keep the lattice in a memory-mapped file in DIR, checkpointed after every run")
+    parser.add_argument("--resume", metavar="DIR", help="continue from the last checkpoint in DIR")
+    parser.add_argument("--load", metavar="FILE", help="start from a cluster file saved with \"Cluster\" (in ./figures/)")
+    parser.add_argument("--backend", default="DENSE", choices=["DENSE", "BITPACKED", "TILED"], help="map of the lattice (TILED has no size limit)")
+    parser.add_argument("--map-size", type=int, help="size of the DENSE, BITPACKED and checkpointed maps (default: {0:d})".format(Lattice.MAP_SIZE))
+    args = parser.parse_args()
+
+    if args.resume is not None:
+        program = DLASimulator(args.resume, isResuming=True)
+    elif args.load is not None:
+        program = DLASimulator(clusterPath=args.load, backend=args.backend)
+    else:
+        program = DLASimulator(args.checkpoint, backend=args.backend, mapSize=args.map_size)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,82 @@
+import numpy as np
+
+import threading
+import time
+
+class ParticleEvents:
+    """
+    Coalesces the particles that stick into one GUI refresh per frame.
+
+    As a Lattice observer, it only appends the coordinates of each new particle to a
+    buffer (which is safe from the worker thread growing the cluster), so the growth
+    loop does no GUI work at all. A timer on the GUI thread calls ParticleEvents.flush
+    every FRAME_INTERVAL seconds: the listeners are called once with all the particles
+    stuck since the last frame, and the figure is redrawn at most once, whatever the
+    particle rate. The figure is redrawn less often when drawing takes more than
+    MAX_DRAW_SHARE of the time, so that a large cluster does not slow the growth down.
+    """
+
+    FRAME_INTERVAL = 0.2 # time between two frames, in seconds
+    MAX_DRAW_SHARE = 0.1 # largest share of the time spent on drawing the figure
+
+    nextDrawTime = 0 # the figure is not redrawn before this time
+
+    def __init__(self, program, plt):
+        # save frequently used objects locally
+        self.program = program
+        self.plt = plt
+
+        # functions called with the x, y coordinates of the new particles (arrays), once per frame
+        self.listeners = []
+
+        # functions called with no arguments at every frame, after the listeners
+        self.frameListeners = []
+
+        # particles stuck since the last frame, filled by the worker thread
+        self.pendingXs, self.pendingYs = [], []
+        self.lock = threading.Lock()
+
+        self.timer = self.program.fig.canvas.new_timer(interval=int(1000 * self.FRAME_INTERVAL))
+        self.timer.add_callback(self.flush)
+        self.timer.start()
+
+    def addListener(self, listener):
+        """ Registers a function to be called with (xs, ys) for the particles stuck since the last frame """
+        self.listeners.append(listener)
+
+    def addFrameListener(self, listener):
+        """ Registers a function to be called at every frame """
+        self.frameListeners.append(listener)
+
+    def particleAddedCallback(self, x, y, radius):
+        """ Lattice observer, queues a new particle for the next frame """
+
+        with self.lock:
+            self.pendingXs.append(x)
+            self.pendingYs.append(y)
+
+    def flush(self):
+        """ Hands the queued particles to the listeners and redraws the figure if it is due (called by the timer) """
+
+        with self.lock:
+            xs, self.pendingXs = self.pendingXs, []
+            ys, self.pendingYs = self.pendingYs, []
+
+        if len(xs) > 0:
+            xs, ys = np.array(xs, dtype=np.int64), np.array(ys, dtype=np.int64)
+
+            for listener in self.listeners:
+                listener(xs, ys)
+
+        for listener in self.frameListeners:
+            listener()
+
+        if len(xs) == 0 or time.time() < self.nextDrawTime:
+            return
+
+        drawTime = time.time()
+        self.program.fig.canvas.draw()
+        drawTime = time.time() - drawTime
+
+        # draw less often if drawing takes long, so that the worker gets most of the time
+        self.nextDrawTime = time.time() + drawTime / self.MAX_DRAW_SHARE
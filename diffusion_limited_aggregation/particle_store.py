@@ -0,0 +1,109 @@
+import numpy as np
+
+import checkpoint
+
+class ParticleStore:
+    """
+    Append-only list of occupied positions (x, y, kind) in arrival order, kept in NumPy arrays.
+
+    The index of an entry is its arrival index. The arrays are doubled in size whenever
+    they are full, so appending is amortised O(1), and the first count entries are
+    always available as slices without copying. Kinds are checkpoint.SEED or PARTICLE.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self):
+        self.xs = np.zeros(self.INITIAL_CAPACITY, dtype=np.int64)
+        self.ys = np.zeros(self.INITIAL_CAPACITY, dtype=np.int64)
+        self.kinds = np.zeros(self.INITIAL_CAPACITY, dtype=np.int8)
+
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, capacity):
+        """ Grows the arrays (doubling their size) until they hold at least capacity entries """
+
+        if capacity <= len(self.xs):
+            return
+
+        newCapacity = len(self.xs)
+
+        while newCapacity < capacity:
+            newCapacity *= 2
+
+        for name in ("xs", "ys", "kinds"):
+            array = getattr(self, name)
+            newArray = np.zeros(newCapacity, dtype=array.dtype)
+            newArray[:self.count] = array[:self.count]
+            setattr(self, name, newArray)
+
+    def append(self, x, y, kind=checkpoint.PARTICLE):
+        """ Adds an entry at the end """
+
+        self._reserve(self.count + 1)
+
+        self.xs[self.count] = x
+        self.ys[self.count] = y
+        self.kinds[self.count] = kind
+        self.count += 1
+
+    def extend(self, xs, ys, kinds=checkpoint.PARTICLE):
+        """ Adds arrays of entries at the end (kinds is one kind for all or an array) """
+
+        count = len(xs)
+        self._reserve(self.count + count)
+
+        self.xs[self.count:self.count + count] = xs
+        self.ys[self.count:self.count + count] = ys
+        self.kinds[self.count:self.count + count] = kinds
+        self.count += count
+
+    def getEntries(self, start=0, end=None):
+        """ Returns the x, y coordinates and kinds of the entries in [start, end) (views, not copies) """
+
+        end = self.count if end is None else min(end, self.count)
+        return self.xs[start:end], self.ys[start:end], self.kinds[start:end]
+
+    def truncate(self, count):
+        """ Forgets all entries after the first count entries """
+        self.count = min(count, self.count)
+
+
+class MappedParticleStore:
+    """
+    ParticleStore for the "MAPPED" lattice, reading and writing the entries of its
+    memory-mapped checkpoint.ArrivalLog, so that no copy of the positions is kept in memory.
+
+    The log holds rows and columns, which are converted to x and y coordinates
+    (centred around the origin) whenever the entries are read.
+    """
+
+    def __init__(self, arrivalLog, centre):
+        self.arrivalLog = arrivalLog
+        self.centre = centre
+
+    def __len__(self):
+        return len(self.arrivalLog)
+
+    def append(self, x, y, kind=checkpoint.PARTICLE):
+        """ Adds an entry at the end """
+        self.arrivalLog.append(y + self.centre, x + self.centre, kind)
+
+    def extend(self, xs, ys, kinds=checkpoint.PARTICLE):
+        """ Adds arrays of entries at the end (kinds is one kind for all or an array) """
+        self.arrivalLog.extend(ys + self.centre, xs + self.centre, kinds)
+
+    def getEntries(self, start=0, end=None):
+        """ Returns the x, y coordinates and kinds of the entries in [start, end) (new arrays read from the log) """
+
+        end = len(self) if end is None else min(end, len(self))
+        rows, cols, kinds = self.arrivalLog.getEntries(start, end)
+
+        return cols.astype(np.int64) - self.centre, rows.astype(np.int64) - self.centre, kinds.astype(np.int8)
+
+    def truncate(self, count):
+        """ Forgets all entries after the first count entries """
+        self.arrivalLog.truncate(min(count, len(self)))
@@ -2,13 +2,38 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 class PlotScreen:
+    """
+    Draws the cluster with one scatter collection for the particles and one for the
+    seeds, so the number of artists does not grow with the cluster. The positions and
+    colours are kept in arrays that grow in place (doubling when full), and each
+    particle is coloured by its arrival index through one colour table, which is
+    only recalculated when it grows or the palette changes.
 
-    plotHandle = []
+    View modes
+        "MARKER": one marker per particle (the default)
+        "RASTER": an image of RASTER_SIZE x RASTER_SIZE pixels, for clusters too large
+                  for markers. Each pixel holds the index of the latest arrival in it,
+                  coloured through a lookup table, and only the bounding box of the
+                  pixels changed since the last update is recoloured. A pixel covers
+                  rasterScale x rasterScale sites, doubled whenever the cluster
+                  outgrows the image.
+    """
 
     firstR, firstG, firstB = 1, 0, 0
     secondR, secondG, secondB = 0, 0, 1
 
-    plotCount = 0
+    plotCount = 0 # the number of particles plotted, excluding the seeds
+    seedCount = 0
+
+    INITIAL_CAPACITY = 1024
+
+    viewMode = "MARKER"
+
+    RASTER_SIZE = 1024 # about twice the width of the screen in pixels
+    MAX_MARKER_COUNT = 100000 # larger clusters are shown as a raster when resumed or loaded
+    # indices of the colour table (and the raster): empty, seed, and particle k (from 1) at k + 1
+    EMPTY_INDEX, SEED_INDEX = 0, 1
+    rasterHandle = None # only created when the raster view is first shown
 
     def __init__(self, program, ptl):
         # save frequently used objects locally
@@ -18,29 +43,185 @@ class PlotScreen:
         # initialise plot axes
         self.axes = self.plt.axes([0.25, 0, 0.5, 1])
 
+        # positions and colours of the plotted particles and seeds
+        self.particleOffsets = np.zeros((self.INITIAL_CAPACITY, 2))
+        self.colourTable = self._getColourTable(self.INITIAL_CAPACITY)
+        self.seedOffsets = np.zeros((self.INITIAL_CAPACITY, 2))
+
+        # marker sizes are areas in points^2, the edges make them as large as the line markers
+        self.particleHandle = self.axes.scatter([], [], s=1, marker='o', linewidths=1)
+        self.seedHandle = self.axes.scatter([], [], s=4, marker='o', color='black', linewidths=1)
+
         # set axis limits and direction
         self.updateAxisLimits()
 
         # plot initial seed
         self.addSeedAt(0, 0)
 
-    def _getNextSingleColour(self, first, second):
-        # returns the next R, G or B value.
-        # sine & cosine functions are to gradually alternate between two preset R,G or B values
+    def _getColours(self, indices):
+        """ Returns the RGB colours of the particles with given arrival indices (1 for the first particle)
+
+        Sine & cosine functions are to gradually alternate between two preset R, G or B values.
+        """
+
+        colours = np.empty((len(indices), 3))
+        pairs = zip((self.firstR, self.firstG, self.firstB), (self.secondR, self.secondG, self.secondB))
+
+        for i, (first, second) in enumerate(pairs):
+            wave = np.cos(indices/1024) if first > second else np.sin(indices/1024)
+            colours[:, i] = abs(first - second) * (wave/2 + 0.5) + min(first, second)
+
+        return colours
+
+    def _reserve(self, array, capacity):
+        """ Returns the array, or a copy twice as large (or more) if it has less than capacity rows """
+
+        if capacity <= len(array):
+            return array
+
+        newArray = np.ones((max(capacity, 2*len(array)),) + array.shape[1:])
+        newArray[:len(array)] = array
+
+        return newArray
+
+    def _getColourTable(self, count):
+        """ Returns the RGBA colours of the table indices up to the index of particle count (empty is transparent) """
+
+        table = np.zeros((count + 2, 4), dtype=np.float32)
+
+        table[self.SEED_INDEX] = [0, 0, 0, 1]
+        table[self.SEED_INDEX+1:, :3] = self._getColours(np.arange(1, count + 1))
+        table[self.SEED_INDEX+1:, 3] = 1
+
+        return table
+
+    def _getParticleColours(self, end):
+        """ Returns the colours of the first end particles (a view of the colour table) """
+        return self.colourTable[self.SEED_INDEX+1:self.SEED_INDEX+1 + end]
+
+    def _reserveColours(self, count):
+        """ Extends the colour table (doubling it) to cover particle count """
+
+        capacity = len(self.colourTable) - 2
+
+        if count > capacity:
+            self.colourTable = self._getColourTable(max(count, 2 * capacity))
+
+    def setPalette(self, first, second):
+        """ Sets the RGB colours to alternate between and recolours every particle plotted so far """
+
+        (self.firstR, self.firstG, self.firstB), (self.secondR, self.secondG, self.secondB) = first, second
+        self.colourTable = self._getColourTable(len(self.colourTable) - 2)
+
+        if self.viewMode == "MARKER":
+            self.particleHandle.set_facecolor(self._getParticleColours(self.plotCount))
+
+        if self.rasterHandle is not None:
+            self.dirtyBox = (0, self.RASTER_SIZE, 0, self.RASTER_SIZE)
+
+            if self.viewMode == "RASTER":
+                self._refreshRaster()
+
+    def _getRasterExtent(self):
+        """ Returns the extent of the raster image in x and y (left, right, bottom, top), pixels centred on the sites """
+
+        halfWidth = self.RASTER_SIZE // 2 * self.rasterScale
+        return (-halfWidth - 0.5, halfWidth - 0.5, halfWidth - 0.5, -halfWidth - 0.5)
+
+    def _createRaster(self):
+        """ Creates the raster image and draws the particles plotted so far """
+
+        self.rasterScale = 1
+        self.rasterGrid = np.zeros((self.RASTER_SIZE, self.RASTER_SIZE), dtype=np.int32)
+        self.rasterImage = np.zeros((self.RASTER_SIZE, self.RASTER_SIZE, 4), dtype=np.float32)
+        self.dirtyBox = None
+
+        self.rasterHandle = self.axes.imshow(self.rasterImage, extent=self._getRasterExtent(), origin='upper',
+                                             interpolation='nearest', aspect='auto')
+
+        self._rasterise(self.seedOffsets[:self.seedCount, 0], self.seedOffsets[:self.seedCount, 1], self.SEED_INDEX)
+        self._rasterise(self.particleOffsets[:self.plotCount, 0], self.particleOffsets[:self.plotCount, 1],
+                        np.arange(self.SEED_INDEX + 1, self.SEED_INDEX + 1 + self.plotCount))
+
+    def _coarsenRaster(self):
+        """ Doubles the sites covered by each pixel, keeping the latest arrival of every 2 x 2 pixels """
+
+        half = self.RASTER_SIZE // 2
+        pooled = self.rasterGrid.reshape(half, 2, half, 2).max(axis=(1, 3))
 
-        if first > second:
-            return abs(first - second) * (np.cos(self.plotCount/1024)/2 + 0.5) + min(first, second)
+        self.rasterGrid.fill(self.EMPTY_INDEX)
+        self.rasterGrid[half//2:half//2 + half, half//2:half//2 + half] = pooled
+
+        self.rasterScale *= 2
+        self.rasterHandle.set_extent(self._getRasterExtent())
+        self.dirtyBox = (0, self.RASTER_SIZE, 0, self.RASTER_SIZE)
+
+    def _rasterise(self, xs, ys, indices):
+        """ Writes the raster indices of sites into the pixels covering them and extends the dirty box """
+
+        if len(xs) == 0:
+            return
+
+        xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+        half = self.RASTER_SIZE // 2
+
+        # the image covers the sites in [-half * rasterScale, half * rasterScale)
+        while max(-xs.min(), xs.max() + 1, -ys.min(), ys.max() + 1) > half * self.rasterScale:
+            self._coarsenRaster()
+
+        rows = half + ys // self.rasterScale
+        cols = half + xs // self.rasterScale
+
+        # later arrivals have larger indices
+        self.rasterGrid[rows, cols] = np.maximum(self.rasterGrid[rows, cols], indices)
+
+        box = (rows.min(), rows.max() + 1, cols.min(), cols.max() + 1)
+
+        if self.dirtyBox is not None:
+            box = (min(box[0], self.dirtyBox[0]), max(box[1], self.dirtyBox[1]), min(box[2], self.dirtyBox[2]), max(box[3], self.dirtyBox[3]))
+
+        self.dirtyBox = box
+
+    def _refreshRaster(self):
+        """ Recolours the dirty box of the raster image through the colour table """
+
+        if self.dirtyBox is None:
+            return
+
+        top, bottom, left, right = self.dirtyBox
+        self.rasterImage[top:bottom, left:right] = self.colourTable[self.rasterGrid[top:bottom, left:right]]
+        self.dirtyBox = None
+
+        self.rasterHandle.set_data(self.rasterImage)
+
+    def _updateMarkers(self):
+        """ Passes all plotted positions and colours to the marker collections """
+
+        self.particleHandle.set_offsets(self.particleOffsets[:self.plotCount])
+        self.particleHandle.set_facecolor(self._getParticleColours(self.plotCount))
+        self.seedHandle.set_offsets(self.seedOffsets[:self.seedCount])
+
+    def setViewMode(self, mode):
+        """ Switches between the "MARKER" and the "RASTER" view (see PlotScreen) """
+
+        if mode == "RASTER":
+            if self.rasterHandle is None:
+                self._createRaster()
+
+            self._refreshRaster()
+        elif mode == "MARKER":
+            self._updateMarkers()
         else:
-            return abs(first - second) * (np.sin(self.plotCount/1024)/2 + 0.5) + min(first, second)
+            print("[Error] <PlotScreen::setViewMode> Undefined Condition")
+            return
+
+        self.viewMode = mode
 
-    def _getNextRGB(self):
-        # returns the next RGB value in a list
-        
-        self.plotCount += 1
+        if self.rasterHandle is not None:
+            self.rasterHandle.set_visible(mode == "RASTER")
 
-        return [self._getNextSingleColour(self.firstR, self.secondR), \
-                self._getNextSingleColour(self.firstG, self.secondG), \
-                self._getNextSingleColour(self.firstB, self.secondB)]
+        self.particleHandle.set_visible(mode == "MARKER")
+        self.seedHandle.set_visible(mode == "MARKER")
 
     def hideScreen(self):
         """ hides the screen by setting the axes size 0 x 0 """
@@ -51,24 +232,64 @@ class PlotScreen:
         self.axes.set_position([0.25, 0, 0.5, 1])
 
     def reset(self):
-        """ Removes all plots and resets plot handler """
+        """ Removes all particles and seeds from the plot """
+
+        self.plotCount = 0
+        self.seedCount = 0
+
+        self._updateMarkers()
 
-        for marker in self.plotHandle:
-            self.axes.lines.remove(marker)
+        if self.rasterHandle is not None:
+            self.rasterGrid.fill(self.EMPTY_INDEX)
+            self.dirtyBox = (0, self.RASTER_SIZE, 0, self.RASTER_SIZE)
+            self._refreshRaster()
 
-        self.plotHandle = []
+    def addSeeds(self, xs, ys):
+        """ Plots seed particles at the given locations """
+
+        start, end = self.seedCount, self.seedCount + len(xs)
+        self.seedOffsets = self._reserve(self.seedOffsets, end)
+
+        self.seedOffsets[start:end, 0] = xs
+        self.seedOffsets[start:end, 1] = ys
+        self.seedCount = end
+
+        if self.rasterHandle is not None:
+            self._rasterise(xs, ys, self.SEED_INDEX)
+
+        if self.viewMode == "RASTER":
+            self._refreshRaster()
+        else:
+            self.seedHandle.set_offsets(self.seedOffsets[:end])
 
     def addSeedAt(self, x, y):
         """ Plots a seed particle at the given location """
+        self.addSeeds([x], [y])
+
+    def addParticles(self, xs, ys):
+        """ Plots particles at the given locations, in arrival order """
+
+        start, end = self.plotCount, self.plotCount + len(xs)
+        self.particleOffsets = self._reserve(self.particleOffsets, end)
+        self._reserveColours(end)
+
+        self.particleOffsets[start:end, 0] = xs
+        self.particleOffsets[start:end, 1] = ys
+        self.plotCount = end
 
-        returned = self.axes.plot(x, y, marker='o', color='black', markersize=2)
-        self.plotHandle.append(returned[0])
+        if self.rasterHandle is not None:
+            self._rasterise(xs, ys, np.arange(self.SEED_INDEX + 1 + start, self.SEED_INDEX + 1 + end))
+
+        # the markers are only updated while shown, they are too many in the raster view
+        if self.viewMode == "RASTER":
+            self._refreshRaster()
+        else:
+            self.particleHandle.set_offsets(self.particleOffsets[:end])
+            self.particleHandle.set_facecolor(self._getParticleColours(end))
 
     def addParticleAt(self, x, y):
         """ Plots a particle at the given location """
-
-        returned = self.axes.plot(x, y, marker='o', color=self._getNextRGB(), markersize=1)
-        self.plotHandle.append(returned[0])
+        self.addParticles([x], [y])
 
     def updateAxisLimits(self):
         """ Updates axis limits to be the widest view """
@@ -80,4 +301,3 @@ class PlotScreen:
         self.axes.set_ylim(-limit, limit)
 
         self.axes.invert_yaxis()
-